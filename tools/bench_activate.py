@@ -0,0 +1,83 @@
+# Measures the latency of sourcing the `activate` script of a virtual
+# environment and of calling `vlttng-deactivate` from Bash.
+#
+# Without a path, this script creates an empty virtual environment
+# (no projects) with a Python site packages directory in a temporary
+# directory.
+#
+# `VLTTNG_NO_RMMOD` is set so that activating doesn't unload kernel
+# modules.
+#
+#     $ python3 tools/bench_activate.py [--iterations=N] [VENV]
+
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import sys
+import os.path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+_SCRIPT = r'''
+activate=$1
+iterations=$2
+total_activate=0
+total_deactivate=0
+
+for ((i = 0; i < iterations; i++)); do
+    begin=${EPOCHREALTIME/[.,]/}
+    source "$activate"
+    mid=${EPOCHREALTIME/[.,]/}
+    vlttng-deactivate
+    end=${EPOCHREALTIME/[.,]/}
+    ((total_activate += mid - begin))
+    ((total_deactivate += end - mid))
+done
+
+echo "$((total_activate / iterations)) $((total_deactivate / iterations))"
+'''
+
+
+def _create_empty_venv(path):
+    import vlttng.venv
+
+    paths = vlttng.venv._Paths(path)
+    os.makedirs(paths.bin)
+    os.makedirs(paths.home)
+    os.makedirs(os.path.join(paths.lib, 'python3', 'site-packages'))
+
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        vlttng.venv._create_activation(paths, {'SOME_VAR': 'some value'})
+
+
+def _bench(venv, iterations):
+    env = dict(os.environ)
+    env['VLTTNG_NO_RMMOD'] = '1'
+    env['PS1'] = '$ '
+    out = subprocess.check_output(['bash', '-c', _SCRIPT, 'bench',
+                                   os.path.join(venv, 'activate'),
+                                   str(iterations)], env=env, text=True)
+    activate_us, deactivate_us = out.split()
+    print(f'activate:   {int(activate_us):>8} us')
+    print(f'deactivate: {int(deactivate_us):>8} us')
+
+
+def _run():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--iterations', type=int, default=200)
+    ap.add_argument('venv', metavar='VENV', nargs='?')
+    args = ap.parse_args()
+
+    if args.venv is not None:
+        _bench(args.venv, args.iterations)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        venv = os.path.join(tmp_dir, 'virt')
+        _create_empty_venv(venv)
+        _bench(venv, args.iterations)
+
+
+if __name__ == '__main__':
+    _run()
@@ -0,0 +1,425 @@
+# Measures the orchestration of `vlttng` and `vlttng update` end to end
+# with synthetic projects instead of the real ones.
+#
+# This script generates fake autotools projects named like the real
+# ones (`urcu`, `lttng-ust`, and so on) with a tunable configure and
+# build CPU cost and a random (incompressible) payload, serves them as
+# tarballs from a local HTTP server and as local bare Git repositories,
+# and then runs, in a temporary directory:
+#
+# 1. `VEnvCreator` with the Git sources.
+# 2. `VEnvCreator` with the HTTP sources.
+# 3. `vlttng update` without any change (update cache hits).
+# 4. `vlttng update` after a change to `urcu` which keeps its interface
+#    (interface cache hits for its dependents).
+# 5. `vlttng update` after a change to the interface of `urcu`
+#    (rebuilds its dependents in parallel).
+#
+# For each run, this script reports:
+#
+# * The wall time.
+# * The ideal wall time: the synthetic CPU cost of the run spread over
+#   the usable CPUs (the make jobs, at most the CPUs of the host),
+#   bounded by its longest dependency chain.
+# * The efficiency: ideal wall time / wall time.
+# * The CPU utilisation: CPU time of the child processes / (wall time *
+#   usable CPUs).
+# * For `VEnvCreator`, the time outside any step, and the CPU time of
+#   vlttng itself: what vlttng adds.
+#
+# It also reports the fetch throughput of each source kind and the
+# number and duration of the cache hits, from the OpenMetrics file of
+# each run (see `vlttng/metrics.py`).
+#
+# The build history goes to a temporary cache directory, so that this
+# script doesn't change the estimations of real runs.
+#
+#     $ python3 tools/bench_orchestration.py [--jobs=JOBS] [--conf-cost=SEC]
+#                                            [--build-cost=SEC] [--units=N]
+#                                            [--payload=MIB] [--keep]
+
+import http.server
+import contextlib
+import subprocess
+import threading
+import functools
+import argparse
+import resource
+import tempfile
+import shutil
+import time
+import sys
+import os.path
+import re
+
+_ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, _ROOT_DIR)
+
+_PROJECTS = (
+    'urcu',
+    'popt',
+    'lttng-ust',
+    'libxml2',
+    'lttng-tools',
+    'glib',
+    'elfutils',
+    'babeltrace2',
+)
+
+# burns `argv[1]` seconds of CPU time
+_BURN_SCRIPT = '''import sys
+import time
+
+end = time.process_time() + float(sys.argv[1])
+
+while time.process_time() < end:
+    pass
+'''
+
+# `configure` of a synthetic project: burns the configure cost and
+# generates a makefile of which the `all` target has independent units
+# (each one burning its share of the build cost)
+_CONFIGURE_SCRIPT = '''#!/bin/sh
+prefix=${{1#--prefix=}}
+{python} {burn} {conf_cost}
+cat > Makefile <<EOF
+UNITS = {units}
+
+all: \\$(UNITS)
+
+u%: src.c Makefile
+\t{python} {burn} {unit_cost} && touch \\$@
+
+install:
+\tmkdir -p $prefix/include $prefix/share/{name}
+\tcp {name}.h $prefix/include/
+\tcp payload.bin $prefix/share/{name}/
+
+uninstall:
+\trm -rf $prefix/include/{name}.h $prefix/share/{name}
+EOF
+'''
+
+_METRIC_LINE_RE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+_METRIC_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _git(cwd, *args):
+    subprocess.run(['git', '-c', 'user.name=bench',
+                    '-c', 'user.email=bench@localhost'] + list(args),
+                   cwd=cwd, check=True, stdin=subprocess.DEVNULL,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class _Bench:
+    def __init__(self, root_dir, args):
+        self._root_dir = root_dir
+        self._args = args
+        self._burn_path = os.path.join(root_dir, 'burn.py')
+        self._work_dir = os.path.join(root_dir, 'work')
+        self._git_dir = os.path.join(root_dir, 'git')
+        self._http_dir = os.path.join(root_dir, 'http')
+        self._rows = []
+        self._notes = []
+
+        # the make jobs can't run on more CPUs than the host has
+        self._parallelism = min(args.jobs, os.cpu_count() or 1)
+
+    def _write_project(self, name):
+        args = self._args
+        path = os.path.join(self._work_dir, name)
+        os.makedirs(path)
+        unit_cost = args.build_cost / args.units
+        units = ' '.join('u{}'.format(i) for i in range(args.units))
+        configure = _CONFIGURE_SCRIPT.format(python=sys.executable,
+                                             burn=self._burn_path,
+                                             conf_cost=args.conf_cost,
+                                             units=units, unit_cost=unit_cost,
+                                             name=name)
+
+        with open(os.path.join(path, 'configure'), 'w') as f:
+            f.write(configure)
+
+        os.chmod(os.path.join(path, 'configure'), 0o755)
+
+        with open(os.path.join(path, '{}.h'.format(name)), 'w') as f:
+            f.write('int {}_version(void);\n'.format(name.replace('-', '_')))
+
+        with open(os.path.join(path, 'src.c'), 'w') as f:
+            f.write('/* 0 */\n')
+
+        with open(os.path.join(path, 'payload.bin'), 'wb') as f:
+            f.write(os.urandom(int(args.payload * 1024 * 1024)))
+
+        # Git source
+        _git(path, 'init', '-q')
+        _git(path, 'add', '.')
+        _git(path, 'commit', '-q', '-m', 'initial')
+        bare_path = os.path.join(self._git_dir, '{}.git'.format(name))
+        _git(self._root_dir, 'init', '-q', '--bare', bare_path)
+        _git(bare_path, 'symbolic-ref', 'HEAD', 'refs/heads/master')
+        _git(path, 'push', '-q', bare_path, 'HEAD:refs/heads/master')
+        _git(path, 'remote', 'add', 'origin', bare_path)
+
+        # HTTP source
+        subprocess.run(['tar', '-czf',
+                        os.path.join(self._http_dir, '{}-1.0.tar.gz'.format(name)),
+                        '--exclude=.git', '--transform',
+                        's,^\\.,{}-1.0,'.format(name), '.'],
+                       cwd=path, check=True)
+
+    def _commit(self, name, interface_change):
+        path = os.path.join(self._work_dir, name)
+        filenames = ['src.c']
+
+        if interface_change:
+            filenames.append('{}.h'.format(name))
+
+        for filename in filenames:
+            with open(os.path.join(path, filename), 'a') as f:
+                f.write('/* {} */\n'.format(time.time()))
+
+        _git(path, 'commit', '-q', '-a', '-m', 'change')
+        _git(path, 'push', '-q', 'origin', 'HEAD:refs/heads/master')
+
+    def _profile(self, base_url):
+        import vlttng.profile
+
+        projects = {}
+
+        for name in _PROJECTS:
+            if base_url is None:
+                source = vlttng.profile.GitSource(os.path.join(self._git_dir,
+                                                               '{}.git'.format(name)),
+                                                  'master')
+            else:
+                source = vlttng.profile.HttpFtpSource('{}/{}-1.0.tar.gz'.format(base_url,
+                                                                                 name))
+
+            projects[name] = vlttng.profile.Project(name, source, '', {})
+
+        return vlttng.profile.Profile({}, {}, projects)
+
+    @staticmethod
+    def _read_metrics(path):
+        metrics = []
+
+        with open(path) as f:
+            for line in f:
+                m = _METRIC_LINE_RE.match(line.strip())
+
+                if m:
+                    labels = dict(_METRIC_LABEL_RE.findall(m.group(2)))
+                    metrics.append((m.group(1), labels, float(m.group(3))))
+
+        return metrics
+
+    # `built` maps the name of each project which the run builds to
+    # whether or not it also configures it; `VEnvCreator` builds the
+    # projects one after the other (`sequential`)
+    def _ideal(self, built, sequential):
+        import vlttng.venv
+
+        args = self._args
+        jobs = self._parallelism
+        costs = {}
+        total_cpu = 0
+
+        for name, conf in built.items():
+            cost = args.build_cost / min(jobs, args.units)
+            total_cpu += args.build_cost
+
+            if conf:
+                cost += args.conf_cost
+                total_cpu += args.conf_cost
+
+            costs[name] = cost
+
+        if sequential:
+            return sum(costs.values())
+
+        # longest chain of the projects to build
+        @functools.lru_cache(maxsize=None)
+        def finish(name):
+            deps = [dep for dep in vlttng.venv._PROJECT_DEPS.get(name, [])
+                    if dep in costs]
+            return max((finish(dep) for dep in deps), default=0) + costs[name]
+
+        return max(total_cpu / jobs, max((finish(n) for n in costs), default=0))
+
+    def _run(self, title, func, built, sequential=False):
+        metrics_path = os.path.join(self._root_dir, 'metrics.prom')
+        usage_self = resource.getrusage(resource.RUSAGE_SELF)
+        usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        begin = time.perf_counter()
+
+        with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+            func(metrics_path)
+
+        wall = time.perf_counter() - begin
+        end_self = resource.getrusage(resource.RUSAGE_SELF)
+        end_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_self = (end_self.ru_utime + end_self.ru_stime -
+                    usage_self.ru_utime - usage_self.ru_stime)
+        cpu_children = (end_children.ru_utime + end_children.ru_stime -
+                        usage_children.ru_utime - usage_children.ru_stime)
+        metrics = self._read_metrics(metrics_path)
+        step_time = sum(v for n, l, v in metrics
+                        if n == 'vlttng_step_duration_seconds' and l['phase'] != 'fetch')
+        fetch_time = sum(v for n, l, v in metrics
+                         if n == 'vlttng_step_duration_seconds' and l['phase'] == 'fetch')
+        downloaded = sum(v for n, l, v in metrics if n == 'vlttng_downloaded_bytes')
+
+        if sequential:
+            outside = wall - step_time - fetch_time
+        else:
+            outside = None
+
+        ideal = self._ideal(built, sequential)
+        self._rows.append((title, wall, ideal, cpu_children / (wall * self._parallelism),
+                           outside, cpu_self))
+        return metrics, fetch_time, downloaded
+
+    def _create(self, source_kind, base_url):
+        import vlttng.venv
+
+        venv_path = os.path.join(self._root_dir, 'venv-{}'.format(source_kind))
+        profile = self._profile(base_url)
+
+        def func(metrics_path):
+            options = vlttng.venv.Options(metrics_file=metrics_path)
+            vlttng.venv.VEnvCreator(venv_path, profile, False, False,
+                                    self._args.jobs, True, options)
+
+        title = 'create ({})'.format(source_kind)
+        built = {name: True for name in _PROJECTS}
+        _, fetch_time, downloaded = self._run(title, func, built,
+                                              sequential=True)
+
+        if fetch_time > 0:
+            self._notes.append('fetch throughput ({}): {:.1f} MiB/s ({:.1f} MiB in {:.2f} s)'.format(source_kind,
+                                                                                                   downloaded / fetch_time / 2**20,
+                                                                                                   downloaded / 2**20,
+                                                                                                   fetch_time))
+
+        return venv_path
+
+    def _update(self, title, venv_path, built):
+        import vlttng.update
+
+        def func(metrics_path):
+            if not vlttng.update.update(venv_path, self._args.jobs, False,
+                                        metrics_file=metrics_path):
+                raise RuntimeError('`vlttng update` failed')
+
+        metrics, _, _ = self._run(title, func, built)
+        wall = self._rows[-1][1]
+
+        for cache in ('update', 'abi'):
+            hits = sum(v for n, l, v in metrics
+                       if n == 'vlttng_cache_hits' and l['cache'] == cache)
+            misses = sum(v for n, l, v in metrics
+                         if n == 'vlttng_cache_misses' and l['cache'] == cache)
+
+            if hits or misses:
+                self._notes.append('{}: {} cache: {:.0f} hits, {:.0f} misses in {:.2f} s'.format(title, cache,
+                                                                                                  hits, misses,
+                                                                                                  wall))
+
+    # `vlttng update` updates `name` (without configuring it) and
+    # reconfigures and rebuilds its dependents
+    @staticmethod
+    def _update_built(name):
+        import vlttng.venv
+
+        built = {name: False}
+        changed = True
+
+        while changed:
+            changed = False
+
+            for project in _PROJECTS:
+                if project not in built and set(vlttng.venv._PROJECT_DEPS.get(project, [])) & set(built):
+                    built[project] = True
+                    changed = True
+
+        return built
+
+    def run(self):
+        os.makedirs(self._work_dir)
+        os.makedirs(self._git_dir)
+        os.makedirs(self._http_dir)
+
+        with open(self._burn_path, 'w') as f:
+            f.write(_BURN_SCRIPT)
+
+        for name in _PROJECTS:
+            self._write_project(name)
+
+        handler = functools.partial(_QuietHandler, directory=self._http_dir)
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+        try:
+            venv_path = self._create('git', None)
+            self._create('http', base_url)
+        finally:
+            server.shutdown()
+
+        self._update('update (no change)', venv_path, {})
+        self._commit('urcu', False)
+        self._update('update (same interface)', venv_path, {'urcu': False})
+        self._commit('urcu', True)
+        self._update('update (interface change)', venv_path,
+                     self._update_built('urcu'))
+        self._print()
+
+    def _print(self):
+        print(f'{"run":<26} {"wall (s)":>9} {"ideal (s)":>9} {"eff.":>6} {"CPU util.":>9} {"outside (s)":>11} {"vlttng CPU (s)":>14}')
+
+        for title, wall, ideal, util, outside, cpu_self in self._rows:
+            eff = '-' if ideal == 0 else '{:.0%}'.format(ideal / wall)
+            outside = '-' if outside is None else '{:.2f}'.format(outside)
+            print(f'{title:<26} {wall:>9.2f} {ideal:>9.2f} {eff:>6} {util:>9.0%} {outside:>11} {cpu_self:>14.2f}')
+
+        print()
+
+        for note in self._notes:
+            print(note)
+
+
+def _run():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                    help='number of make jobs')
+    ap.add_argument('--conf-cost', type=float, default=0.2,
+                    help='configure CPU time of each project (seconds)')
+    ap.add_argument('--build-cost', type=float, default=1,
+                    help='build CPU time of each project (seconds)')
+    ap.add_argument('--units', type=int, default=4,
+                    help='number of independent build units of each project')
+    ap.add_argument('--payload', type=float, default=4,
+                    help='random payload of each project (MiB)')
+    ap.add_argument('--keep', action='store_true',
+                    help='keep and print the temporary directory')
+    args = ap.parse_args()
+    root_dir = tempfile.mkdtemp(prefix='vlttng-bench-')
+    os.environ['XDG_CACHE_HOME'] = os.path.join(root_dir, 'cache')
+
+    try:
+        _Bench(root_dir, args).run()
+    finally:
+        if args.keep:
+            print('temporary directory: {}'.format(root_dir))
+        else:
+            shutil.rmtree(root_dir)
+
+
+if __name__ == '__main__':
+    _run()
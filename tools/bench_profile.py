@@ -0,0 +1,222 @@
+# Measures the resolution of profiles: YAML parsing, merging, override
+# application, and `Profile` construction, over all the bundled
+# profiles and over realistic stacks of them, for example:
+#
+#     lttng-stable-2.13 + lttng-tools-python + lttng-tools-no-man-pages
+#     + debug-flags + overrides
+#
+# Each benchmark runs `ITERATIONS` times with the garbage collector
+# disabled and the memoization caches of `vlttng.profile` cleared (except
+# for the `from_yaml_profiles (warm)` one): this script reports the
+# median and minimum times, which are stable enough to compare against
+# a baseline.
+#
+# With `--save`, this script saves the median times to a JSON file;
+# with `--compare`, it compares them to the ones of such a file and
+# exits with status 1 when one of them regressed by more than
+# `--threshold` percent.
+#
+#     $ python3 tools/bench_profile.py [--iterations=N] [--save=FILE]
+#                                      [--compare=FILE] [--threshold=PCT]
+
+import statistics
+import argparse
+import json
+import time
+import sys
+import gc
+import os.path
+
+_ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, _ROOT_DIR)
+
+import vlttng.profile_index
+import vlttng.profile
+import yaml
+
+# feature profiles to stack on top of each base profile
+_FEATURES = (
+    'lttng-tools-python',
+    'lttng-tools-no-man-pages',
+    'lttng-ust-python-agent',
+    'debug-flags',
+)
+
+_OVERRIDES = (
+    ('projects.lttng-tools.configure', vlttng.profile.Override.OP_APPEND, '--disable-static'),
+    ('build-env.CFLAGS', vlttng.profile.Override.OP_REPLACE, '-O2 -g'),
+    ('projects.lttng-tools.build-env.CC', vlttng.profile.Override.OP_REPLACE, 'gcc'),
+    ('virt-env.LTTNG_HOME', vlttng.profile.Override.OP_REPLACE, '/tmp/lttng-home'),
+)
+
+
+def _overrides():
+    return [vlttng.profile.Override(path.split('.'), op, rep)
+            for path, op, rep in _OVERRIDES]
+
+
+def _clear_caches():
+    vlttng.profile._parsed_cache.clear()
+    vlttng.profile._effective_cache.clear()
+
+
+def _parse(text):
+    return yaml.load(text, Loader=vlttng.profile._YamlLoader) or {}
+
+
+def _stacks():
+    index = vlttng.profile_index.load()
+    stacks = []
+
+    # every `lttng` branch and every LTTng-tools release, with all
+    # the features
+    for branch in index.branches.get('lttng', []):
+        stacks.append([vlttng.profile_index.profile_name('lttng', branch)] + list(_FEATURES))
+
+    for version in index.releases.get('lttng-tools', []):
+        stacks.append([vlttng.profile_index.profile_name('lttng-tools', version),
+                       'lttng-tools-python', 'lttng-tools-no-man-pages',
+                       'debug-flags'])
+
+    # keep the stacks which resolve
+    texts = []
+
+    for stack in stacks:
+        stack_texts = [vlttng.profile_index.read_profile(name) for name in stack]
+
+        try:
+            vlttng.profile.from_yaml_profiles(stack_texts, [], _overrides(),
+                                              False)
+        except Exception:
+            continue
+
+        texts.append(stack_texts)
+
+    return texts
+
+
+def _merge(trees):
+    root_node = {}
+
+    for tree in trees:
+        vlttng.profile._merge_nodes(root_node, vlttng.profile._copy_node(tree))
+
+    return root_node
+
+
+def _construct(root_node):
+    build_env = root_node.get('build-env', {})
+    virt_env = root_node.get('virt-env', {})
+    projects = {}
+
+    for name, project_node in root_node['projects'].items():
+        if project_node is not None:
+            projects[name] = vlttng.profile._project_from_project_node(name, project_node,
+                                                                       build_env)
+
+    vlttng.profile._validate_projects(projects)
+    return vlttng.profile.Profile(virt_env, build_env, projects)
+
+
+def _bench(func, iterations, setup=None, clear=True):
+    times = []
+    gc.disable()
+
+    try:
+        for _ in range(iterations):
+            arg = setup() if setup is not None else None
+
+            if clear:
+                _clear_caches()
+
+            begin = time.perf_counter()
+            func(arg)
+            times.append(time.perf_counter() - begin)
+    finally:
+        gc.enable()
+
+    return statistics.median(times), min(times)
+
+
+def _benches(stacks):
+    names = vlttng.profile_index.archive_profile_names()
+    all_texts = [vlttng.profile_index.read_profile(name) for name in names]
+    stack_trees = [[_parse(text) for text in texts] for texts in stacks]
+    merged = [_merge(trees) for trees in stack_trees]
+
+    def apply_overrides(roots):
+        for root_node in roots:
+            for override in _overrides():
+                override.apply(root_node)
+
+    def resolve(_):
+        for texts in stacks:
+            vlttng.profile.from_yaml_profiles(texts, [], _overrides(), False)
+
+    # `setup` returns fresh trees: the operations modify them
+    return (
+        ('parse: all profiles', lambda _: [_parse(t) for t in all_texts], None, True),
+        ('parse: stacks', lambda _: [[_parse(t) for t in texts] for texts in stacks], None, True),
+        ('merge: stacks', lambda _: [_merge(trees) for trees in stack_trees], None, True),
+        ('override: stacks', apply_overrides,
+         lambda: [vlttng.profile._copy_node(r) for r in merged], True),
+        ('construct: stacks', lambda roots: [_construct(r) for r in roots],
+         lambda: [vlttng.profile._copy_node(r) for r in merged], True),
+        ('from_yaml_profiles (cold)', resolve, None, True),
+        ('from_yaml_profiles (warm)', resolve, None, False),
+    )
+
+
+def _run():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--iterations', type=int, default=20)
+    ap.add_argument('--save', metavar='FILE')
+    ap.add_argument('--compare', metavar='FILE')
+    ap.add_argument('--threshold', type=float, default=10,
+                    help='regression threshold (percent)')
+    args = ap.parse_args()
+    stacks = _stacks()
+    print(f'{len(vlttng.profile_index.archive_profile_names())} profiles')
+    print(f'{len(stacks)} stacks of {sum(len(s) for s in stacks) / len(stacks):.1f} profiles and {len(_OVERRIDES)} overrides')
+    print()
+
+    baseline = {}
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f'{"benchmark":<28} {"median (ms)":>12} {"min (ms)":>12} {"vs. base":>9}')
+
+    for name, func, setup, clear in _benches(stacks):
+        if not clear:
+            # fill the caches
+            func(None)
+
+        median, best = _bench(func, args.iterations, setup, clear)
+        results[name] = median
+        ratio = ''
+
+        if name in baseline:
+            change = median / baseline[name] - 1
+            ratio = f'{change:+.1%}'
+
+            if change * 100 > args.threshold:
+                regressions.append(name)
+
+        print(f'{name:<28} {median * 1e3:>12.3f} {best * 1e3:>12.3f} {ratio:>9}')
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print()
+        print('Regressed: {}'.format(', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run()
@@ -0,0 +1,92 @@
+# Compares the former layout of the bundled profiles (about 1,400 loose
+# `.yml` files which `vlttng -l` and `vlttng-quick` walked) with the
+# prebuilt profile index and the single profile archive.
+#
+# The loose layout is the `profiles` directory of the repository.
+#
+#     $ python3 tools/bench_profile_index.py [ITERATIONS]
+
+import statistics
+import random
+import time
+import sys
+import os.path
+import re
+
+_ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, _ROOT_DIR)
+
+import vlttng.profile_index
+
+_PROFILES_DIR = os.path.join(_ROOT_DIR, 'profiles')
+
+
+def _scan():
+    filenames = []
+
+    for filename in os.listdir(_PROFILES_DIR):
+        if os.path.isfile(os.path.join(_PROFILES_DIR, filename)) and filename.endswith('.yml'):
+            filenames.append(filename)
+
+    versions = []
+
+    for filename in sorted(filenames):
+        profile = filename[:-4]
+
+        if re.match(r'^.+-\d+(\.\d+)*$', profile):
+            versions.append(profile)
+
+    return filenames, versions
+
+
+def _load_index():
+    return vlttng.profile_index._load().names
+
+
+def _read_loose(names):
+    for name in names:
+        path = os.path.join(_PROFILES_DIR, '{}.yml'.format(name))
+
+        if os.path.isfile(path):
+            with open(path) as f:
+                f.read()
+
+
+def _read_archive(names):
+    index = vlttng.profile_index.load()
+
+    for name in names:
+        if name in index:
+            vlttng.profile_index.read_profile(name)
+
+
+def _bench(func, iterations):
+    times = []
+
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - begin)
+
+    return statistics.median(times), min(times)
+
+
+def _run(iterations):
+    names = sorted(vlttng.profile_index.load().names)
+    names = random.Random(0).sample(names, 200)
+    benches = (
+        ('list: scan', _scan),
+        ('list: index', _load_index),
+        ('read 200: loose', lambda: _read_loose(names)),
+        ('read 200: archive', lambda: _read_archive(names)),
+    )
+
+    print(f'{"method":<20} {"median (ms)":>12} {"min (ms)":>12}')
+
+    for name, func in benches:
+        median, best = _bench(func, iterations)
+        print(f'{name:<20} {median * 1e3:>12.3f} {best * 1e3:>12.3f}')
+
+
+if __name__ == '__main__':
+    _run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,108 @@
+# Measures the startup time of the `vlttng` and `vlttng-quick` modes
+# which don't build anything, and checks it against the budget of
+# `startup-budget.json` (next to this script).
+#
+# For each mode, this script reports:
+#
+# * The cold figures: first run with an empty bytecode cache.
+# * The warm figures: median of the following runs.
+#
+# The import time is the sum of the top-level cumulative import times
+# which `python3 -X importtime` reports.
+#
+# The budget of a mode contains the maximum warm import time and the
+# modules which the mode must not import. This script exits with
+# status 1 when a mode exceeds its budget.
+#
+#     $ python3 tools/bench_startup.py [ITERATIONS]
+
+import statistics
+import subprocess
+import tempfile
+import json
+import time
+import sys
+import os.path
+
+_ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+_BUDGET_PATH = os.path.join(os.path.dirname(__file__), 'startup-budget.json')
+_MODES = {
+    'vlttng -V': ('vlttng.vlttng_cli', ['vlttng', '-V']),
+    'vlttng -l': ('vlttng.vlttng_cli', ['vlttng', '-l']),
+    'vlttng-quick -V': ('vlttng.vlttng_quick_cli', ['vlttng-quick', '-V']),
+}
+
+
+def _run_mode(module, argv, pycache_dir):
+    code = f'import sys; sys.argv = {argv!r}; from {module} import run; run()'
+    env = dict(os.environ)
+    env['PYTHONPATH'] = _ROOT_DIR
+    env['PYTHONPYCACHEPREFIX'] = pycache_dir
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    begin = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          env=env, text=True)
+    wall = time.perf_counter() - begin
+    import_us = 0
+    modules = set()
+
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+
+        # top-level import: single space of indentation
+        if len(name) - len(name.lstrip()) == 1:
+            import_us += int(cumulative)
+
+    return wall, import_us / 1000, modules
+
+
+def _bench_mode(module, argv, iterations):
+    with tempfile.TemporaryDirectory() as pycache_dir:
+        cold_wall, cold_import, modules = _run_mode(module, argv, pycache_dir)
+        warm = [_run_mode(module, argv, pycache_dir) for _ in range(iterations)]
+
+    warm_wall = statistics.median(w[0] for w in warm)
+    warm_import = statistics.median(w[1] for w in warm)
+    return cold_wall * 1000, cold_import, warm_wall * 1000, warm_import, modules
+
+
+def _run(iterations):
+    with open(_BUDGET_PATH) as f:
+        budget = json.load(f)
+
+    violations = []
+    print(f'{"mode":<18} {"cold (ms)":>10} {"cold imp.":>10} {"warm (ms)":>10} {"warm imp.":>10}')
+
+    for mode, (module, argv) in _MODES.items():
+        cold_wall, cold_import, warm_wall, warm_import, modules = _bench_mode(module, argv,
+                                                                              iterations)
+        print(f'{mode:<18} {cold_wall:>10.1f} {cold_import:>10.1f} {warm_wall:>10.1f} {warm_import:>10.1f}')
+        mode_budget = budget.get(mode, {})
+        max_import = mode_budget.get('max-warm-import-ms')
+
+        if max_import is not None and warm_import > max_import:
+            violations.append(f'{mode}: warm import time {warm_import:.1f} ms > {max_import} ms')
+
+        for forbidden in mode_budget.get('forbidden-modules', []):
+            if forbidden in modules:
+                violations.append(f'{mode}: imports `{forbidden}`')
+
+    if violations:
+        print()
+        print('Startup budget exceeded:')
+
+        for violation in violations:
+            print(f'  {violation}')
+
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_run(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,126 @@
+# Checks the `vlttng-lttng-modules-unload-order` function of the
+# `activate` script against fake `/proc/modules` files: the function
+# must list each loaded LTTng module exactly once, after all the LTTng
+# modules which use it (fourth column), and no other module.
+#
+# This script extracts the function from `vlttng/activate_template.py`
+# and runs it with Bash: it doesn't need any kernel module.
+#
+#     $ python3 tools/check_modules_unload_order.py
+
+import tempfile
+import subprocess
+import sys
+import os.path
+import re
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from vlttng.activate_template import activate_template
+
+_SCRIPT = r'''
+vlttng-lttng-modules-unload-order "$1"
+printf '%s\n' "${_vlttng_modules_to_unload[@]}"
+'''
+
+# name to fake `/proc/modules` content
+_CASES = {
+    'typical': '''\
+lttng_probe_sched 16384 0 - Live 0x0000000000000000 (O)
+lttng_probe_irq 16384 0 - Live 0x0000000000000000 (O)
+lttng_ring_buffer_client_discard 24576 0 - Live 0x0000000000000000 (O)
+lttng_tracer 2334720 3 lttng_probe_sched,lttng_probe_irq,lttng_ring_buffer_client_discard, Live 0x0000000000000000 (O)
+lttng_lib_ring_buffer 57344 2 lttng_ring_buffer_client_discard,lttng_tracer, Live 0x0000000000000000 (O)
+lttng_statedump 16384 1 lttng_tracer, Live 0x0000000000000000 (O)
+lttng_clock 16384 2 lttng_tracer,lttng_lib_ring_buffer, Live 0x0000000000000000 (O)
+ext4 987136 1 - Live 0x0000000000000000
+mbcache 16384 1 ext4, Live 0x0000000000000000
+''',
+    # users listed before the module which they use
+    'reversed': '''\
+lttng_clock 16384 2 lttng_tracer,lttng_lib_ring_buffer, Live 0x0000000000000000 (O)
+lttng_lib_ring_buffer 57344 1 lttng_tracer, Live 0x0000000000000000 (O)
+lttng_tracer 2334720 1 lttng_probe_sched, Live 0x0000000000000000 (O)
+lttng_probe_sched 16384 0 - Live 0x0000000000000000 (O)
+''',
+    # a non-LTTng user of an LTTng module (can't be unloaded first)
+    'foreign-user': '''\
+lttng_tracer 2334720 1 my_probe, Live 0x0000000000000000 (O)
+my_probe 16384 0 - Live 0x0000000000000000 (O)
+''',
+    'no-lttng': '''\
+ext4 987136 1 - Live 0x0000000000000000
+''',
+    'empty': '',
+    # dependency cycle: all the modules, in any order
+    'cycle': '''\
+lttng_a 16384 1 lttng_b, Live 0x0000000000000000 (O)
+lttng_b 16384 1 lttng_a, Live 0x0000000000000000 (O)
+''',
+}
+
+
+def _function():
+    m = re.search(r'^vlttng-lttng-modules-unload-order\(\) \{\{$.*?^\}\}$',
+                  activate_template, re.MULTILINE | re.DOTALL)
+    return m.group(0).replace('{{', '{').replace('}}', '}')
+
+
+def _modules(content):
+    modules = {}
+
+    for line in content.splitlines():
+        fields = line.split()
+        users = [u for u in fields[3].split(',') if u and u != '-']
+        modules[fields[0]] = users
+
+    return modules
+
+
+def _check(name, content, order):
+    modules = _modules(content)
+    lttng_modules = [m for m in modules if m.startswith('lttng')]
+    errors = []
+
+    if sorted(order) != sorted(lttng_modules):
+        errors.append('expecting the modules {}'.format(sorted(lttng_modules)))
+
+    if name != 'cycle':
+        for mod in order:
+            for user in modules[mod]:
+                if user in order and order.index(user) > order.index(mod):
+                    errors.append('{} comes before its user {}'.format(mod,
+                                                                       user))
+
+    return errors
+
+
+def _run():
+    script = _function() + _SCRIPT
+    failed = False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, content in _CASES.items():
+            path = os.path.join(tmp_dir, name)
+
+            with open(path, 'w') as f:
+                f.write(content)
+
+            out = subprocess.check_output(['bash', '-c', script, 'check', path],
+                                          text=True)
+            order = [line for line in out.splitlines() if line]
+            errors = _check(name, content, order)
+            status = 'FAIL' if errors else 'ok'
+            print(f'{name:<14} {status:<4} {" ".join(order)}')
+
+            for error in errors:
+                print(f'    {error}')
+
+            failed = failed or bool(errors)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run()
@@ -0,0 +1,37 @@
+# Packs the profiles of the `profiles` directory (for example, as
+# written by `create_profiles.py`) into `vlttng/profiles.zip`, the
+# single archive which vlttng ships, and regenerates
+# `vlttng/profile-index.json`.
+#
+# Run this from the root of the repository after adding, removing, or
+# modifying profiles:
+#
+#     $ python3 tools/create_profiles.py profiles
+#     $ python3 tools/pack_profiles.py
+
+import sys
+import os.path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import vlttng
+import vlttng.profile_index
+
+
+def _pack_profiles(profiles_dir, pkg_dir):
+    archive_path = os.path.join(pkg_dir, vlttng._PROFILES_ARCHIVE_FILENAME)
+    index = vlttng.profile_index.write_archive(profiles_dir, archive_path)
+    print(f'Packed {len(index.names)} profiles into `{archive_path}`.')
+    index_path = os.path.join(pkg_dir, vlttng.profile_index.INDEX_FILENAME)
+
+    with open(index_path, 'w') as f:
+        f.write(index.to_json())
+        f.write('\n')
+
+    print(f'Wrote profile index `{index_path}`.')
+
+
+if __name__ == '__main__':
+    root_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+    _pack_profiles(os.path.join(root_dir, 'profiles'),
+                   os.path.join(root_dir, 'vlttng'))
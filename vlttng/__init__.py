@@ -21,4 +21,4 @@
 # THE SOFTWARE.
 
 __version__ = '0.11.2'
-_PROFILES_DIRNAME = 'profiles'
+_PROFILES_ARCHIVE_FILENAME = 'profiles.zip'
@@ -0,0 +1,261 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# The installed interface of a project: for each of its shared
+# libraries, the SONAME and the exported dynamic symbols, and for each
+# of its public headers, the SHA-256 hash of its content.
+#
+# `VEnvCreator` records which files a project installs, and their
+# interface, to the state directory of the virtual environment.
+# `vlttng update` computes the interface of an updated project again,
+# from the same files and the ones which the update installed, and only
+# rebuilds its dependents when it changed. A new or removed file is an
+# interface change.
+#
+# The shared libraries are keyed by their unversioned name (for
+# example, `lib/liburcu.so`) so that a library version bump which
+# keeps the interface isn't a change.
+
+import subprocess
+import hashlib
+import os.path
+import json
+import glob
+import os
+import re
+
+
+_SO_RE = re.compile(r'^(?P<name>.+\.so)(?:\.\d+)*$')
+_SONAME_RE = re.compile(r'\(SONAME\)\s+Library soname: \[(?P<soname>[^\]]+)\]')
+
+# exported symbol types: a change of size of a data object is an
+# interface change
+_SYM_TYPES = {'FUNC', 'IFUNC', 'OBJECT', 'TLS', 'COMMON'}
+
+
+def _abi_dir(venv_path):
+    import vlttng.venv_env
+
+    return os.path.join(vlttng.venv_env.state_dir(venv_path), 'abi')
+
+
+def _abi_path(venv_path, name):
+    return os.path.join(_abi_dir(venv_path), '{}.json'.format(name))
+
+
+def _walk(top):
+    for dirpath, dirnames, filenames in os.walk(top):
+        for filename in filenames:
+            yield os.path.join(dirpath, filename)
+
+
+# relative paths (to `usr_path`) of the shared libraries and headers
+# installed (or reinstalled) since `since_ns` (nanoseconds since the
+# epoch)
+def installed_files(usr_path, since_ns):
+    libs = set()
+    headers = []
+
+    for path in _walk(os.path.join(usr_path, 'lib')):
+        m = _SO_RE.match(path)
+
+        if m is None:
+            continue
+
+        # `lstat()`: `make install` creates new symbolic links too
+        if os.lstat(path).st_mtime_ns >= since_ns:
+            libs.add(os.path.relpath(m.group('name'), usr_path))
+
+    for path in _walk(os.path.join(usr_path, 'include')):
+        if os.lstat(path).st_mtime_ns >= since_ns:
+            headers.append(os.path.relpath(path, usr_path))
+
+    return sorted(libs), sorted(headers)
+
+
+def _resolve_lib(usr_path, lib):
+    path = os.path.join(usr_path, lib)
+
+    if os.path.exists(path):
+        return path
+
+    # no unversioned link: latest versioned file
+    paths = sorted(glob.glob(glob.escape(path) + '.*'))
+
+    if paths:
+        return paths[-1]
+
+
+def _lib_interface(path):
+    try:
+        output = subprocess.check_output(['readelf', '-W', '-d', '--dyn-syms', path],
+                                         stdin=subprocess.DEVNULL,
+                                         stderr=subprocess.DEVNULL,
+                                         universal_newlines=True)
+    except (OSError, subprocess.CalledProcessError):
+        # unknown interface
+        return
+
+    soname = None
+    symbols = []
+
+    for line in output.splitlines():
+        m = _SONAME_RE.search(line)
+
+        if m:
+            soname = m.group('soname')
+            continue
+
+        # `Num: Value Size Type Bind Vis Ndx Name`
+        fields = line.split()
+
+        if len(fields) < 8 or not fields[0].endswith(':') or not fields[0][:-1].isdigit():
+            continue
+
+        size, sym_type, bind, ndx, sym_name = fields[2], fields[3], fields[4], fields[6], fields[7]
+
+        if ndx == 'UND' or bind not in ('GLOBAL', 'WEAK') or sym_type not in _SYM_TYPES:
+            continue
+
+        if sym_type == 'FUNC' or sym_type == 'IFUNC':
+            symbols.append('{} {}'.format(sym_type, sym_name))
+        else:
+            symbols.append('{} {} {}'.format(sym_type, sym_name, size))
+
+    return {
+        'soname': soname,
+        'symbols': sorted(set(symbols)),
+    }
+
+
+def _header_hash(path):
+    h = hashlib.sha256()
+
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                h.update(chunk)
+    except OSError:
+        return
+
+    return h.hexdigest()
+
+
+# interface of the files `libs` and `headers` (as returned by
+# `installed_files()`); a missing file has a `None` interface
+def compute(usr_path, libs, headers):
+    lib_interfaces = {}
+
+    for lib in libs:
+        path = _resolve_lib(usr_path, lib)
+        lib_interfaces[lib] = _lib_interface(path) if path is not None else None
+
+    return {
+        'libs': lib_interfaces,
+        'headers': {h: _header_hash(os.path.join(usr_path, h)) for h in headers},
+    }
+
+
+def load(venv_path, name):
+    try:
+        with open(_abi_path(venv_path, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return
+
+
+def save(venv_path, name, interface):
+    os.makedirs(_abi_dir(venv_path), exist_ok=True)
+    path = _abi_path(venv_path, name)
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, 'w') as f:
+        json.dump(interface, f, indent=1, sort_keys=True)
+
+    os.replace(tmp_path, path)
+
+
+# Interface of the files of the recorded interface `interface` and of
+# the files installed since `since_ns` (see `installed_files()`), except
+# the ones of the recorded interfaces `others` (other projects, which
+# may install at the same time). A file which doesn't exist anymore
+# isn't part of the new interface.
+def recompute(usr_path, interface, since_ns, others=()):
+    new_libs, new_headers = installed_files(usr_path, since_ns)
+    libs = set(new_libs)
+    headers = set(new_headers)
+
+    for other in others:
+        libs -= set(other['libs'])
+        headers -= set(other['headers'])
+
+    libs = [lib for lib in libs | set(interface['libs'])
+            if _resolve_lib(usr_path, lib) is not None]
+    headers = [header for header in headers | set(interface['headers'])
+               if os.path.lexists(os.path.join(usr_path, header))]
+    return compute(usr_path, sorted(libs), sorted(headers))
+
+
+# human-readable differences between the interfaces `old` and `new`
+# (empty when they're the same)
+def diff(old, new):
+    diffs = []
+
+    for lib in sorted(set(old['libs']) | set(new['libs'])):
+        if lib not in old['libs']:
+            diffs.append('{}: added'.format(lib))
+            continue
+
+        if lib not in new['libs']:
+            diffs.append('{}: removed'.format(lib))
+            continue
+
+        old_lib = old['libs'][lib]
+        new_lib = new['libs'][lib]
+
+        if old_lib is None or new_lib is None:
+            diffs.append('{}: unknown interface'.format(lib))
+            continue
+
+        if old_lib['soname'] != new_lib['soname']:
+            diffs.append('{}: SONAME {} -> {}'.format(lib, old_lib['soname'],
+                                                      new_lib['soname']))
+
+        old_syms = set(old_lib['symbols'])
+        new_syms = set(new_lib['symbols'])
+        removed = len(old_syms - new_syms)
+        added = len(new_syms - old_syms)
+
+        if removed or added:
+            diffs.append('{}: {} removed and {} added symbols'.format(lib, removed,
+                                                                      added))
+
+    for header in sorted(set(old['headers']) | set(new['headers'])):
+        if header not in old['headers']:
+            diffs.append('{}: added'.format(header))
+        elif header not in new['headers']:
+            diffs.append('{}: removed'.format(header))
+        elif old['headers'][header] is None or old['headers'][header] != new['headers'][header]:
+            diffs.append('{}: changed'.format(header))
+
+    return diffs
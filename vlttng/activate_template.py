@@ -57,7 +57,6 @@ vlttng-save-env() {{
 
 # Local options
 _vlttng_has_modules={has_modules}
-_vlttng_has_java={has_java}
 _vlttng_has_lttng_scope={has_lttng_scope}
 
 # Path to the virtual environment
@@ -95,38 +94,13 @@ PKG_CONFIG_PATH="$VLTTNG/usr/lib/pkgconfig:$PKG_CONFIG_PATH"
 export PKG_CONFIG_PATH
 
 # Set `VLTTNG_CLASSPATH`
-if ((_vlttng_has_java)); then
-    VLTTNG_CLASSPATH="$VLTTNG/usr/share/java/liblttng-ust-agent.jar"
-    VLTTNG_CLASSPATH+=":$VLTTNG/usr/share/java/log4j.jar"
-    VLTTNG_CLASSPATH+=":$VLTTNG/usr/share/java/log4j2/log4j-api.jar"
-    VLTTNG_CLASSPATH+=":$VLTTNG/usr/share/java/log4j2/log4j-core.jar"
-    VLTTNG_CLASSPATH+=":$VLTTNG/usr/share/java/log4j2/log4j-1.2-api.jar"
-    export VLTTNG_CLASSPATH
-fi
+{classpath}
 
 # Save old `PYTHONPATH`
 vlttng-save-env PYTHONPATH
 
 # Add Python site packages to `PYTHONPATH`
-while read -r _vlttng_python_root; do
-    # Installed Python packages directory, if available
-    _vlttng_python_packages=$(find "$_vlttng_python_root" -maxdepth 1 -iname '*-packages' -a -type d | head -n1)
-
-    if [[ -n "$_vlttng_python_packages" ]]; then
-        # Set new `PYTHONPATH`
-        if [[ -z "$PYTHONPATH" ]]; then
-            PYTHONPATH=$_vlttng_python_packages
-        else
-            PYTHONPATH=$_vlttng_python_packages:$PYTHONPATH
-        fi
-
-        export PYTHONPATH
-    fi
-
-    unset _vlttng_python_packages
-done < <(find "$VLTTNG/usr/lib" -maxdepth 1 -iname 'python*' -a -type d)
-
-unset _vlttng_python_root
+{pythonpath}
 
 # Set new `LTTNG_HOME`
 vlttng-save-env LTTNG_HOME
@@ -136,28 +110,66 @@ export LTTNG_HOME
 # Save old `MODPROBE_OPTIONS`
 vlttng-save-env MODPROBE_OPTIONS
 
-if ((_vlttng_has_modules)); then
-    if [[ $VLTTNG_NO_RMMOD != 1 ]]; then
-        _vlttng_removed_all_modules=0
+# Set `_vlttng_modules_to_unload` to the names of the LTTng kernel
+# modules which the modules file `$1` (`/proc/modules` format) lists,
+# each module coming after the modules which use it (fourth column).
+vlttng-lttng-modules-unload-order() {{
+    local name size refcount users rest mod other blocked
+    local -a remaining next
+    local -A mod_users
+
+    _vlttng_modules_to_unload=()
+    remaining=()
+
+    while read -r name size refcount users rest; do
+        if [[ $name == lttng* ]]; then
+            remaining+=("$name")
+            mod_users[$name]=",$users"
+        fi
+    done < "$1"
+
+    while ((${{#remaining[@]}})); do
+        next=()
 
-        # Try to remove all the LTTng kernel modules
-        while ((! _vlttng_removed_all_modules)); do
-            _vlttng_one_module=0
+        # unload the modules which no remaining module uses
+        for mod in "${{remaining[@]}}"; do
+            blocked=0
 
-            # shellcheck disable=SC2013
-            for _vlttng_module in $(cut -d' ' -f1 < /proc/modules | grep '^lttng'); do
-                _vlttng_one_module=1
-                sudo rmmod "$_vlttng_module" 2>/dev/null
+            for other in "${{remaining[@]}}"; do
+                if [[ ${{mod_users[$mod]}} == *,$other,* ]]; then
+                    blocked=1
+                    break
+                fi
             done
 
-            if ((! _vlttng_one_module)); then
-                _vlttng_removed_all_modules=1
+            if ((blocked)); then
+                next+=("$mod")
+            else
+                _vlttng_modules_to_unload+=("$mod")
             fi
         done
 
-        unset _vlttng_removed_all_modules
-        unset _vlttng_one_module
-        unset _vlttng_module
+        if ((${{#next[@]}} == ${{#remaining[@]}})); then
+            # dependency cycle: let `rmmod` do what it can
+            _vlttng_modules_to_unload+=("${{next[@]}}")
+            break
+        fi
+
+        remaining=("${{next[@]}}")
+    done
+}}
+
+if ((_vlttng_has_modules)); then
+    if [[ $VLTTNG_NO_RMMOD != 1 && -r /proc/modules ]]; then
+        # Remove all the LTTng kernel modules in dependency order with
+        # a single `sudo` call
+        vlttng-lttng-modules-unload-order /proc/modules
+
+        if ((${{#_vlttng_modules_to_unload[@]}})); then
+            sudo rmmod "${{_vlttng_modules_to_unload[@]}}" 2>/dev/null
+        fi
+
+        unset _vlttng_modules_to_unload
     fi
 
     export MODPROBE_OPTIONS="-d '$VLTTNG/usr'"
@@ -178,7 +190,7 @@ vlttng-save-env PS1
 
 # Set new prompt
 if [[ "$VLTTNG_NO_PROMPT" != 1 ]]; then
-    PS1="[$(basename "$VLTTNG")] $PS1"
+    PS1={prompt_prefix}"$PS1"
     export PS1
 fi
 
@@ -188,7 +200,6 @@ if [[ -n "${{BASH-}}" || -n "${{ZSH_VERSION-}}" ]]; then
 fi
 
 unset _vlttng_has_modules
-unset _vlttng_has_java
 unset _vlttng_has_lttng_scope
 
 vlttng-restore-env() {{
@@ -229,6 +240,7 @@ vlttng-deactivate() {{
     unset -f vlttng-deactivate
     unset -f vlttng-save-env
     unset -f vlttng-restore-env
+    unset -f vlttng-lttng-modules-unload-order
     unset -f lttng-scope 2>/dev/null
 }}
 '''
@@ -0,0 +1,420 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# `vlttng bench`: runs a standard workload set within a virtual
+# environment and saves the results to its state directory so that
+# `vlttng bench --compare` can compare virtual environments (and
+# therefore LTTng versions):
+#
+# * Tracepoint throughput: an LTTng-UST application, built against the
+#   virtual environment, hits a tracepoint in a loop, first without any
+#   recording session (disabled tracepoint), then within a started
+#   one (enabled tracepoint).
+#
+# * Trace decoding throughput: `babeltrace2` (or `babeltrace`) reads
+#   the trace of the enabled run without printing it.
+#
+# * Session latency: durations of the `lttng` commands which create,
+#   start, stop, and destroy a recording session.
+#
+# The workloads run with their own session daemon and `LTTNG_HOME` in a
+# temporary directory: they don't touch the sessions of the user.
+
+import subprocess
+import statistics
+import contextlib
+import tempfile
+import os.path
+import shutil
+import json
+import time
+import os
+from vlttng.utils import perror, tree_size
+
+
+RESULTS_FILENAME = 'bench.json'
+
+# name, description, unit, whether lower is better
+_METRICS = (
+    ('tp_disabled_ns', 'Disabled tracepoint', 'ns/event', True),
+    ('tp_enabled_ns', 'Enabled tracepoint', 'ns/event', True),
+    ('tp_recorded_ratio', 'Recorded events', '%', False),
+    ('decode_events_per_s', 'Trace decoding', 'events/s', False),
+    ('decode_mib_per_s', 'Trace decoding', 'MiB/s', False),
+    ('session_create_ms', 'lttng create', 'ms', True),
+    ('session_start_ms', 'lttng start', 'ms', True),
+    ('session_stop_ms', 'lttng stop', 'ms', True),
+    ('session_destroy_ms', 'lttng destroy', 'ms', True),
+)
+
+_TP_HEADER = '''#undef TRACEPOINT_PROVIDER
+#define TRACEPOINT_PROVIDER vlttng_bench
+
+#undef TRACEPOINT_INCLUDE
+#define TRACEPOINT_INCLUDE "./tp.h"
+
+#if !defined(_TP_H) || defined(TRACEPOINT_HEADER_MULTI_READ)
+#define _TP_H
+
+#include <lttng/tracepoint.h>
+
+TRACEPOINT_EVENT(
+    vlttng_bench,
+    event,
+    TP_ARGS(long, index, const char *, msg),
+    TP_FIELDS(
+        ctf_integer(long, index, index)
+        ctf_string(msg, msg)
+    )
+)
+
+#endif
+
+#include <lttng/tracepoint-event.h>
+'''
+
+# prints the duration of the loop (nanoseconds)
+_TP_APP = '''#define TRACEPOINT_DEFINE
+#define TRACEPOINT_CREATE_PROBES
+#include "tp.h"
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+
+int main(int argc, char *argv[])
+{
+    long count = atol(argv[1]);
+    struct timespec begin, end;
+    long i;
+
+    clock_gettime(CLOCK_MONOTONIC, &begin);
+
+    for (i = 0; i < count; i++) {
+        tracepoint(vlttng_bench, event, i, "vlttng");
+    }
+
+    clock_gettime(CLOCK_MONOTONIC, &end);
+    printf("%lld\\n", (long long) (end.tv_sec - begin.tv_sec) * 1000000000LL +
+           (end.tv_nsec - begin.tv_nsec));
+    return 0;
+}
+'''
+
+
+def results_path(venv_path):
+    import vlttng.venv_env
+
+    return os.path.join(vlttng.venv_env.state_dir(venv_path), RESULTS_FILENAME)
+
+
+def load_results(venv_path):
+    with open(results_path(venv_path)) as f:
+        return json.load(f)
+
+
+class _Bench:
+    def __init__(self, venv_path, events, iterations):
+        import vlttng.venv_env
+
+        self._venv_path = venv_path
+        self._events = events
+        self._iterations = iterations
+
+        try:
+            ops = vlttng.venv_env.load(venv_path)
+        except FileNotFoundError:
+            perror('"{}" is not a vlttng virtual environment (missing "{}")'.format(venv_path,
+                                                                                    vlttng.venv_env.env_path(venv_path)))
+
+        self._env = vlttng.venv_env.apply(ops, os.environ)
+        self._results = {}
+        self._versions = {}
+
+    def _which(self, name):
+        return shutil.which(name, path=self._env.get('PATH'))
+
+    def _run(self, args, check=True, stdout=subprocess.PIPE, **kwargs):
+        return subprocess.run(args, env=self._env, stdin=subprocess.DEVNULL,
+                              stdout=stdout, stderr=subprocess.PIPE,
+                              check=check, universal_newlines=True, **kwargs)
+
+    def _version(self, name):
+        try:
+            out = self._run([name, '--version']).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return
+
+        lines = out.strip().splitlines()
+
+        if lines:
+            self._versions[name] = lines[0]
+
+    def _lttng(self, *args):
+        self._run(['lttng'] + list(args))
+
+    @contextlib.contextmanager
+    def _sessiond(self, work_dir):
+        log_path = os.path.join(work_dir, 'lttng-sessiond.log')
+
+        with open(log_path, 'w') as log:
+            proc = subprocess.Popen(['lttng-sessiond', '--no-kernel'],
+                                    env=self._env, stdin=subprocess.DEVNULL,
+                                    stdout=subprocess.DEVNULL, stderr=log)
+
+        try:
+            # wait until it accepts commands
+            deadline = time.monotonic() + 10
+
+            while True:
+                res = self._run(['lttng', 'list'], check=False)
+
+                if res.returncode == 0:
+                    break
+
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    with open(log_path) as f:
+                        sessiond_stderr = f.read().strip()
+
+                    raise RuntimeError('Cannot start the session daemon (`lttng list`: {}):\n{}'.format(res.stderr.strip(),
+                                                                                                         sessiond_stderr))
+
+                time.sleep(.05)
+
+            yield
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    def _build_app(self, work_dir):
+        with open(os.path.join(work_dir, 'tp.h'), 'w') as f:
+            f.write(_TP_HEADER)
+
+        with open(os.path.join(work_dir, 'app.c'), 'w') as f:
+            f.write(_TP_APP)
+
+        cmd = '${CC:-cc} -O2 -I. $CPPFLAGS -o app app.c $LDFLAGS -llttng-ust -ldl'
+        self._run(cmd, shell=True, cwd=work_dir)
+        return os.path.join(work_dir, 'app')
+
+    def _run_app(self, app):
+        out = self._run([app, str(self._events)]).stdout
+        return int(out.strip()) / self._events
+
+    def _bench_tracepoints(self, work_dir, app):
+        from vlttng.venv import _pinfo
+
+        _pinfo('Disabled tracepoint ({} events)'.format(self._events))
+        self._results['tp_disabled_ns'] = self._run_app(app)
+
+        _pinfo('Enabled tracepoint ({} events)'.format(self._events))
+        trace_path = os.path.join(work_dir, 'trace')
+        self._lttng('create', 'vlttng-bench', '--output={}'.format(trace_path))
+        self._lttng('enable-channel', '--userspace', '--subbuf-size=1M',
+                    '--num-subbuf=8', 'chan')
+        self._lttng('enable-event', '--userspace', '--channel=chan',
+                    'vlttng_bench:event')
+        self._lttng('start')
+        self._results['tp_enabled_ns'] = self._run_app(app)
+        self._lttng('stop')
+        self._lttng('destroy')
+        return trace_path
+
+    def _bench_decoding(self, trace_path):
+        from vlttng.venv import _pinfo
+
+        reader = None
+
+        for name in ('babeltrace2', 'babeltrace'):
+            if self._which(name) is not None:
+                reader = name
+                self._version(name)
+                break
+
+        if reader is None:
+            _pinfo('Skip trace decoding: no babeltrace2 or babeltrace')
+            return
+
+        # count the events (untimed), then decode without printing
+        with subprocess.Popen([reader, trace_path], env=self._env,
+                              stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL) as proc:
+            count = 0
+
+            for chunk in iter(lambda: proc.stdout.read(1 << 16), b''):
+                count += chunk.count(b'\n')
+
+        self._results['tp_recorded_ratio'] = 100 * count / self._events
+        _pinfo('Decode {} events with {}'.format(count, reader))
+        durations = []
+
+        for _ in range(self._iterations):
+            begin = time.perf_counter()
+            self._run([reader, '--output-format=dummy', trace_path],
+                      stdout=subprocess.DEVNULL)
+            durations.append(time.perf_counter() - begin)
+
+        duration = statistics.median(durations)
+        self._results['decode_events_per_s'] = count / duration
+        self._results['decode_mib_per_s'] = tree_size(trace_path) / duration / 2**20
+
+    def _bench_sessions(self, work_dir):
+        from vlttng.venv import _pinfo
+
+        _pinfo('Session latency ({} iterations)'.format(self._iterations))
+        durations = {'create': [], 'start': [], 'stop': [], 'destroy': []}
+
+        for i in range(self._iterations):
+            name = 'vlttng-bench-{}'.format(i)
+            output = '--output={}'.format(os.path.join(work_dir, name))
+
+            for what, args in (('create', ['create', name, output]),
+                               ('enable-event', ['enable-event', '--userspace', '--session', name,
+                                                 'vlttng_bench:event']),
+                               ('start', ['start', name]),
+                               ('stop', ['stop', name]),
+                               ('destroy', ['destroy', name])):
+                begin = time.perf_counter()
+                self._lttng(*args)
+
+                if what in durations:
+                    durations[what].append(time.perf_counter() - begin)
+
+        for what, values in durations.items():
+            self._results['session_{}_ms'.format(what)] = statistics.median(values) * 1e3
+
+    def run(self):
+        from vlttng.venv import _pinfo, _pwarn
+
+        for name in ('lttng', 'lttng-sessiond'):
+            if self._which(name) is None:
+                perror('Cannot find `{}` in "{}": the virtual environment needs LTTng-tools'.format(name,
+                                                                                                    self._venv_path))
+
+        self._version('lttng')
+        has_ust = os.path.isfile(os.path.join(self._venv_path, 'usr', 'include',
+                                              'lttng', 'tracepoint.h'))
+
+        with tempfile.TemporaryDirectory(prefix='vlttng-bench-') as work_dir:
+            # isolated session daemon
+            self._env['LTTNG_HOME'] = work_dir
+            self._env['LTTNG_UST_REGISTER_TIMEOUT'] = '10000'
+
+            with self._sessiond(work_dir):
+                if has_ust:
+                    try:
+                        app = self._build_app(work_dir)
+                    except subprocess.CalledProcessError as e:
+                        perror('Cannot build the tracepoint application:\n{}'.format(e.stderr))
+
+                    trace_path = self._bench_tracepoints(work_dir, app)
+                    self._bench_decoding(trace_path)
+                else:
+                    _pwarn('Skip the tracepoint and trace decoding workloads: the virtual environment has no LTTng-UST')
+
+                self._bench_sessions(work_dir)
+
+        results = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'venv': self._venv_path,
+            'events': self._events,
+            'iterations': self._iterations,
+            'versions': self._versions,
+            'results': self._results,
+        }
+
+        with open(results_path(self._venv_path), 'w') as f:
+            json.dump(results, f, indent=2)
+
+        return results
+
+
+def _fmt_value(value, unit):
+    if value is None:
+        return '-'
+
+    if unit in ('events/s',):
+        return '{:,.0f}'.format(value)
+
+    return '{:.1f}'.format(value)
+
+
+def print_results(all_results):
+    titles = [os.path.basename(r['venv'].rstrip('/')) or r['venv'] for r in all_results]
+    width = max([12] + [len(t) for t in titles])
+    rows = []
+
+    for key, description, unit, lower_is_better in _METRICS:
+        values = [r['results'].get(key) for r in all_results]
+
+        if all(v is None for v in values):
+            continue
+
+        label = '{} ({}, {})'.format(description, unit,
+                                     'lower is better' if lower_is_better else 'higher is better')
+        rows.append((label, values, unit))
+
+    label_width = max([0] + [len(row[0]) for row in rows])
+    print(' ' * label_width + ''.join(' {:>{}}'.format(t, width) for t in titles))
+
+    for label, values, unit in rows:
+        print('{:<{}}'.format(label, label_width) +
+              ''.join(' {:>{}}'.format(_fmt_value(v, unit), width) for v in values))
+
+    print()
+
+    for title, results in zip(titles, all_results):
+        versions = '; '.join(results['versions'].values())
+        print('{}: {} ({})'.format(title, versions, results['time']))
+
+
+def bench(venv_paths, events, iterations):
+    all_results = []
+
+    for venv_path in venv_paths:
+        try:
+            all_results.append(_Bench(venv_path, events, iterations).run())
+        except subprocess.CalledProcessError as e:
+            cmd = e.cmd if type(e.cmd) is str else ' '.join(e.cmd)
+            perror('Cannot benchmark "{}": `{}` failed with exit status {}:\n{}'.format(venv_path,
+                                                                                        cmd,
+                                                                                        e.returncode,
+                                                                                        (e.stderr or '').strip()))
+        except (OSError, RuntimeError) as e:
+            perror('Cannot benchmark "{}": {}'.format(venv_path, e))
+
+    print()
+    print_results(all_results)
+
+
+def compare(venv_paths):
+    all_results = []
+
+    for venv_path in venv_paths:
+        try:
+            all_results.append(load_results(venv_path))
+        except FileNotFoundError:
+            perror('No benchmark results for "{}" (run `vlttng bench {}` first)'.format(venv_path,
+                                                                                        venv_path))
+
+    print_results(all_results)
@@ -50,6 +50,9 @@ conf_template = '''#!/usr/bin/env bash
 # Make sure we're in the right current working directory
 cd {src_path} || exit 1
 
+# Stop at the first failing command
+set -e
+
 # Set the original build-time environment
 {exports}
 
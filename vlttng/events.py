@@ -0,0 +1,137 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# Build events.
+#
+# `VEnvCreator` and `vlttng update` report the begin and end of each step
+# (a phase, like `build`, of a project) to a hub which forwards them to
+# its listeners (progress view, duration history, and so on).
+
+import contextlib
+import threading
+import time
+
+
+class Step:
+    def __init__(self, project, phase, jobs=None):
+        self.project = project
+        self.phase = phase
+        self.jobs = jobs
+        self.begin_ns = time.monotonic_ns()
+        self.end_ns = None
+        self.ok = None
+
+    @property
+    def duration(self):
+        end_ns = self.end_ns if self.end_ns is not None else time.monotonic_ns()
+        return (end_ns - self.begin_ns) / 1e9
+
+
+# base listener: override the methods of the events to handle
+class Listener:
+    def on_step_begin(self, step):
+        pass
+
+    def on_step_end(self, step):
+        pass
+
+    # the command `cmd` starts within the phase `phase` of the project
+    # `project` (both `None` outside any step)
+    def on_command(self, project, phase, cmd):
+        pass
+
+    # lookup of `key` in the cache `cache` (for example, `abi` for
+    # the interface of a dependency)
+    def on_cache_lookup(self, cache, key, hit):
+        pass
+
+    # `size` bytes downloaded for the project `project`
+    def on_download(self, project, size):
+        pass
+
+    # informational message which a listener may show
+    def on_message(self, msg):
+        pass
+
+    # end of the whole run (`ok` is whether or not it succeeded)
+    def on_run_end(self, ok):
+        pass
+
+    def on_close(self):
+        pass
+
+
+class Hub:
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, method_name, *args):
+        # listeners don't need to be thread-safe
+        with self._lock:
+            for listener in self._listeners:
+                getattr(listener, method_name)(*args)
+
+    def begin(self, project, phase, jobs=None):
+        step = Step(project, phase, jobs)
+        self._notify('on_step_begin', step)
+        return step
+
+    def end(self, step, ok):
+        step.end_ns = time.monotonic_ns()
+        step.ok = ok
+        self._notify('on_step_end', step)
+
+    # context manager which wraps a step: the step fails if the block
+    # raises (including `SystemExit`)
+    @contextlib.contextmanager
+    def step(self, project, phase, jobs=None):
+        step = self.begin(project, phase, jobs)
+        ok = False
+
+        try:
+            yield step
+            ok = step.ok is not False
+        finally:
+            self.end(step, ok)
+
+    def command(self, project, phase, cmd):
+        self._notify('on_command', project, phase, cmd)
+
+    def cache_lookup(self, cache, key, hit):
+        self._notify('on_cache_lookup', cache, key, hit)
+
+    def download(self, project, size):
+        self._notify('on_download', project, size)
+
+    def message(self, msg):
+        self._notify('on_message', msg)
+
+    def run_end(self, ok):
+        self._notify('on_run_end', ok)
+
+    def close(self):
+        self._notify('on_close')
@@ -0,0 +1,257 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# Build history: the durations of the steps of past runs, in an SQLite
+# database in the vlttng cache directory (`$XDG_CACHE_HOME/vlttng`, or
+# `~/.cache/vlttng`).
+#
+# Each row is one step (phase of a project) keyed by the project
+# version (Git commit or source archive name), its configure flags, the
+# number of CPUs of the host, and the number of make jobs. The `run`
+# and `command` columns identify the run (`create` or `update`) which
+# executed the step.
+#
+# The history estimates the duration of a step from the most specific
+# matching past steps, used to show the remaining time, to predict the
+# total time of a run, to schedule the longest dependency chains first,
+# and to flag regressed steps.
+
+import vlttng.events
+import statistics
+import threading
+import os.path
+import time
+import os
+
+
+DB_FILENAME = 'history.sqlite3'
+
+# number of past durations to estimate a duration
+_ESTIMATE_SAMPLE_COUNT = 8
+
+# a step regressed when it takes that many times its estimated
+# duration, and at least `_REGRESSION_MIN_DELTA` seconds more
+_REGRESSION_FACTOR = 1.5
+_REGRESSION_MIN_DELTA = 10
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS steps (
+    time REAL NOT NULL,
+    venv TEXT,
+    project TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    version TEXT,
+    configure TEXT,
+    cores INTEGER,
+    jobs INTEGER,
+    duration REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    run TEXT NOT NULL,
+    command TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS steps_project_phase ON steps (project, phase, time);
+'''
+
+
+def cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'vlttng')
+
+
+def db_path():
+    return os.path.join(cache_dir(), DB_FILENAME)
+
+
+def host_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count()
+
+
+def connect(path=None):
+    import sqlite3
+
+    path = path or db_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # other vlttng processes may write at the same time
+    db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    db.executescript(_SCHEMA)
+    return db
+
+
+# Successful duration and make job count of each step of the latest run
+# which installed each project of the virtual environment `venv_path`,
+# as a dictionary of project name to phase name to `(duration, jobs)`.
+#
+# The steps of a project come from a single run: an `update` step
+# already contains the configure, build, and install phases, and the
+# fetch steps of `vlttng update` run concurrently for all the projects.
+def latest_steps(venv_path, path=None):
+    db = connect(path)
+
+    # SQLite takes the `run` of the row with the maximum time
+    try:
+        rows = db.execute('''
+SELECT steps.project, phase, duration, jobs FROM steps
+JOIN (SELECT project, run, MAX(time) FROM steps
+      WHERE venv = :venv AND ok = 1 AND phase IN ('install', 'update')
+      GROUP BY project) AS latest
+ON steps.project = latest.project AND steps.run = latest.run
+WHERE venv = :venv AND ok = 1 AND NOT (command = 'update' AND phase = 'fetch')
+ORDER BY time
+''', {'venv': venv_path}).fetchall()
+    finally:
+        db.close()
+
+    steps = {}
+
+    for project, phase, duration, jobs in rows:
+        steps.setdefault(project, {})[phase] = (duration, jobs)
+
+    return steps
+
+
+class Regression:
+    def __init__(self, step, estimate):
+        self.step = step
+        self.estimate = estimate
+
+    @property
+    def factor(self):
+        return self.step.duration / self.estimate
+
+
+class History(vlttng.events.Listener):
+    # `enabled` is false to neither read nor write the database
+    def __init__(self, venv_path=None, path=None, command='create',
+                 enabled=True):
+        self._venv_path = venv_path
+        self._run = '{:x}-{}'.format(time.time_ns(), os.getpid())
+        self._command = command
+        self._cores = host_cores()
+        self._projects = {}
+        self._estimates = {}
+        self._regressions = []
+        self._lock = threading.Lock()
+        self._db = None
+
+        if not enabled:
+            return
+
+        import sqlite3
+
+        try:
+            self._db = connect(path)
+        except (sqlite3.Error, OSError):
+            # the history is only a nice to have
+            pass
+
+    # sets the version and configure flags of the project `name` for the
+    # next steps
+    def set_project(self, name, version=None, configure=None):
+        with self._lock:
+            self._projects[name] = (version, configure)
+            self._estimates = {k: v for k, v in self._estimates.items()
+                               if k[0] != name}
+
+    @property
+    def regressions(self):
+        return list(self._regressions)
+
+    def _query(self, project, phase, jobs):
+        version, configure = self._projects.get(project, (None, None))
+        base = [('project', project), ('phase', phase)]
+
+        # from the most to the least specific
+        levels = [
+            base + [('version', version), ('configure', configure),
+                    ('cores', self._cores), ('jobs', jobs)],
+            base + [('configure', configure), ('cores', self._cores),
+                    ('jobs', jobs)],
+            base + [('cores', self._cores)],
+            base,
+        ]
+
+        for level in levels:
+            if any(value is None for _, value in level):
+                continue
+
+            where = ' AND '.join('{} = ?'.format(col) for col, _ in level)
+            rows = self._db.execute('SELECT duration FROM steps WHERE ok = 1 AND {} ORDER BY time DESC LIMIT ?'.format(where),
+                                    [value for _, value in level] + [_ESTIMATE_SAMPLE_COUNT]).fetchall()
+
+            if rows:
+                return statistics.median(row[0] for row in rows)
+
+    # estimated duration (seconds) of the phase `phase` of the project
+    # `project` with `jobs` make jobs, or `None` if unknown
+    def estimate(self, project, phase, jobs=None):
+        import sqlite3
+
+        if self._db is None:
+            return
+
+        key = (project, phase, jobs)
+
+        with self._lock:
+            if key not in self._estimates:
+                try:
+                    self._estimates[key] = self._query(project, phase, jobs)
+                except sqlite3.Error:
+                    self._estimates[key] = None
+
+            return self._estimates[key]
+
+    def on_step_end(self, step):
+        import sqlite3
+
+        if self._db is None:
+            return
+
+        estimate = self.estimate(step.project, step.phase, step.jobs)
+
+        if step.ok and estimate is not None:
+            if (step.duration > estimate * _REGRESSION_FACTOR and
+                    step.duration - estimate >= _REGRESSION_MIN_DELTA):
+                self._regressions.append(Regression(step, estimate))
+
+        version, configure = self._projects.get(step.project, (None, None))
+
+        try:
+            with self._lock:
+                with self._db:
+                    self._db.execute('INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     (time.time(), self._venv_path, step.project,
+                                      step.phase, version, configure,
+                                      self._cores, step.jobs,
+                                      round(step.duration, 3), int(bool(step.ok)),
+                                      self._run, self._command))
+        except sqlite3.Error:
+            pass
+
+    def on_close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
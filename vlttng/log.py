@@ -0,0 +1,208 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# Command output logging.
+#
+# The output of the commands which vlttng runs goes to one log file per
+# project and phase (`VENV/logs/PROJECT/PHASE.log`, optionally
+# compressed with gzip).
+#
+# The thread which reads a command's output only queues the data for a
+# background writer thread and keeps the last lines in a bounded tail
+# buffer, shown when the command fails: a slow terminal never blocks
+# the command itself, and a slow disk only blocks it once the bounded
+# file queue is full. Echoing the output to the terminal (verbose mode)
+# is lossy: when the terminal can't keep up, vlttng drops lines from
+# the terminal, never from the log file.
+
+import collections
+import threading
+import os.path
+import queue
+import sys
+import os
+
+
+# number of lines which the tail buffer of a log keeps
+TAIL_LINE_COUNT = 50
+
+# maximum length of a line in the tail buffer
+_MAX_TAIL_LINE_LEN = 4096
+
+# maximum number of queued terminal lines before dropping some
+_MAX_ECHO_QUEUE_SIZE = 4096
+
+# maximum number of queued log file writes (up to 64 KiB each) before
+# blocking the reader of the command's output
+_MAX_FILE_QUEUE_SIZE = 256
+
+
+def log_path(venv_path, project, phase, compress=False):
+    filename = '{}.log'.format(phase)
+
+    if compress:
+        filename += '.gz'
+
+    return os.path.join(venv_path, 'logs', project, filename)
+
+
+class _Worker:
+    # `maxsize` is the maximum number of queued calls (0: unbounded)
+    def __init__(self, name, maxsize=0):
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name=name,
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def size(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            func, args, done = self._queue.get()
+
+            try:
+                func(*args)
+            except Exception:
+                # logging must never break the build
+                pass
+
+            if done is not None:
+                done.set()
+
+    def submit(self, func, *args):
+        self._queue.put((func, args, None))
+
+    def sync(self, func=None, *args):
+        done = threading.Event()
+        self._queue.put((func or (lambda: None), args, done))
+        done.wait()
+
+
+_file_worker = None
+_echo_worker = None
+_workers_lock = threading.Lock()
+
+
+def _workers():
+    global _file_worker, _echo_worker
+
+    with _workers_lock:
+        if _file_worker is None:
+            _file_worker = _Worker('vlttng-log-file', _MAX_FILE_QUEUE_SIZE)
+            _echo_worker = _Worker('vlttng-log-echo')
+
+    return _file_worker, _echo_worker
+
+
+def _echo(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+class Log:
+    # `echo_prefix` is `None` to not echo the output to the terminal
+    def __init__(self, path, compress=False, echo_prefix=None,
+                 append=False):
+        self._path = path
+        self._echo_prefix = echo_prefix
+        self._tail = collections.deque(maxlen=TAIL_LINE_COUNT)
+        self._partial = b''
+        self._dropped = 0
+        self._file_worker, self._echo_worker = _workers()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        mode = 'ab' if append else 'wb'
+
+        if compress:
+            import gzip
+
+            # fast compression: the build output is very redundant (an
+            # appended log is a valid multi-member gzip file)
+            self._file = gzip.open(path, mode, compresslevel=1)
+        else:
+            self._file = open(path, mode, buffering=1 << 16)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def tail(self):
+        lines = list(self._tail)
+
+        if self._partial:
+            lines.append(self._partial)
+
+        return [line.decode(errors='replace') for line in lines]
+
+    def _echo_lines(self, lines):
+        if self._echo_prefix is None or not lines:
+            return
+
+        if self._echo_worker.size >= _MAX_ECHO_QUEUE_SIZE:
+            self._dropped += len(lines)
+            return
+
+        text = ''
+
+        if self._dropped:
+            text += '{}[{} lines not shown: see "{}"]\n'.format(self._echo_prefix,
+                                                                self._dropped,
+                                                                self._path)
+            self._dropped = 0
+
+        text += ''.join('{}{}\n'.format(self._echo_prefix,
+                                        line.decode(errors='replace'))
+                        for line in lines)
+        self._echo_worker.submit(_echo, text)
+
+    # writes the command line `cmd` as a log header
+    def write_cmd(self, cmd):
+        self.write('$ {}\n'.format(cmd).encode())
+
+    def write(self, data):
+        self._file_worker.submit(self._file.write, data)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()[:_MAX_TAIL_LINE_LEN]
+        lines = [line[:_MAX_TAIL_LINE_LEN] for line in lines]
+        self._tail.extend(lines)
+        self._echo_lines(lines)
+
+    # reads the file descriptor `fd` until the end of file
+    def write_from_fd(self, fd):
+        while True:
+            data = os.read(fd, 1 << 16)
+
+            if not data:
+                break
+
+            self.write(data)
+
+    def close(self):
+        if self._partial:
+            self._echo_lines([self._partial])
+
+        self._file_worker.sync(self._file.close)
+        self._echo_worker.sync()
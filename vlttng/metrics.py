@@ -0,0 +1,200 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# OpenMetrics text file of the build metrics of a run, for example for
+# the textfile collector of the Prometheus node exporter.
+#
+# The file is rewritten atomically after each step (at most every
+# `_WRITE_PERIOD` seconds) and at the end of the run. All the metrics
+# are gauges describing the current (or last) run, labelled with the
+# virtual environment path and the effective profile hash.
+
+import vlttng.profile
+import vlttng.events
+import resource
+import hashlib
+import os.path
+import json
+import time
+import os
+
+
+PROFILE_HASH_FILENAME = 'profile-hash'
+
+# minimum seconds between two writes during the run
+_WRITE_PERIOD = 5
+
+
+def profile_hash(profile):
+    projects = {}
+
+    for name, project in profile.projects.items():
+        source = project.source
+
+        if type(source) is vlttng.profile.GitSource:
+            source_node = [source.clone_url, source.checkout]
+        else:
+            source_node = [source.url]
+
+        projects[name] = [source_node, project.configure, project.build_env]
+
+    node = [profile.virt_env, profile.build_env, projects]
+    text = json.dumps(node, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _profile_hash_path(venv_path):
+    import vlttng.venv_env
+
+    return os.path.join(vlttng.venv_env.state_dir(venv_path),
+                        PROFILE_HASH_FILENAME)
+
+
+def save_profile_hash(venv_path, hash):
+    with open(_profile_hash_path(venv_path), 'w') as f:
+        f.write(hash + '\n')
+
+
+def load_profile_hash(venv_path):
+    try:
+        with open(_profile_hash_path(venv_path)) as f:
+            return f.read().strip()
+    except OSError:
+        return 'unknown'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsWriter(vlttng.events.Listener):
+    # `command` is `create` or `update`
+    def __init__(self, path, venv_path, profile_hash, command):
+        self._path = path
+        self._labels = [('venv', venv_path), ('profile_hash', profile_hash),
+                        ('command', command)]
+        self._start_time = time.time()
+        self._steps = {}
+        self._cache = {}
+        self._downloads = {}
+        self._exit_status = None
+        self._last_write_time = 0
+
+    def _fmt_labels(self, extra=()):
+        labels = self._labels + list(extra)
+        return ','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels)
+
+    def _families(self):
+        # metric name, help, samples (`(extra labels, value)`)
+        families = []
+        families.append(('vlttng_step_duration_seconds',
+                         'Duration of the last run of a step',
+                         [((('project', p), ('phase', ph)), round(d, 3))
+                          for (p, ph), (d, _) in sorted(self._steps.items())]))
+        families.append(('vlttng_step_success',
+                         'Whether or not the last run of a step succeeded',
+                         [((('project', p), ('phase', ph)), int(ok))
+                          for (p, ph), (_, ok) in sorted(self._steps.items())]))
+        families.append(('vlttng_cache_hits',
+                         'Number of cache hits during the run',
+                         [((('cache', c),), hits)
+                          for c, (hits, _) in sorted(self._cache.items())]))
+        families.append(('vlttng_cache_misses',
+                         'Number of cache misses during the run',
+                         [((('cache', c),), misses)
+                          for c, (_, misses) in sorted(self._cache.items())]))
+        families.append(('vlttng_downloaded_bytes',
+                         'Number of bytes downloaded during the run',
+                         [((('project', p),), size)
+                          for p, size in sorted(self._downloads.items())]))
+
+        # `ru_maxrss` is in kibibytes on Linux
+        rss_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        rss_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+        families.append(('vlttng_peak_rss_bytes',
+                         'Peak resident set size of vlttng and of its largest child process',
+                         [((('process', 'self'),), rss_self),
+                          ((('process', 'children'),), rss_children)]))
+        families.append(('vlttng_run_start_timestamp_seconds',
+                         'Start time of the run',
+                         [((), round(self._start_time, 3))]))
+        families.append(('vlttng_run_duration_seconds',
+                         'Duration of the run so far',
+                         [((), round(time.time() - self._start_time, 3))]))
+        families.append(('vlttng_run_running',
+                         'Whether or not the run is still running',
+                         [((), int(self._exit_status is None))]))
+
+        if self._exit_status is not None:
+            families.append(('vlttng_run_exit_status',
+                             'Exit status of the run (0 means success)',
+                             [((), self._exit_status)]))
+
+        return families
+
+    def _write(self):
+        lines = []
+
+        for name, help, samples in self._families():
+            lines.append('# HELP {} {}.'.format(name, help))
+            lines.append('# TYPE {} gauge'.format(name))
+
+            for extra, value in samples:
+                lines.append('{}{{{}}} {}'.format(name, self._fmt_labels(extra),
+                                                  value))
+
+        lines.append('# EOF')
+        tmp_path = '{}.{}.tmp'.format(self._path, os.getpid())
+
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+
+            # atomic for the collector
+            os.replace(tmp_path, self._path)
+        except OSError:
+            pass
+
+        self._last_write_time = time.monotonic()
+
+    def on_step_end(self, step):
+        self._steps[(step.project, step.phase)] = (step.duration, bool(step.ok))
+
+        if time.monotonic() - self._last_write_time >= _WRITE_PERIOD:
+            self._write()
+
+    def on_cache_lookup(self, cache, key, hit):
+        hits, misses = self._cache.get(cache, (0, 0))
+        self._cache[cache] = (hits + int(hit), misses + int(not hit))
+
+    def on_download(self, project, size):
+        self._downloads[project] = self._downloads.get(project, 0) + size
+
+    def on_run_end(self, ok):
+        self._exit_status = 0 if ok else 1
+
+    def on_close(self):
+        if self._exit_status is None:
+            self._exit_status = 1
+
+        self._write()
@@ -20,8 +20,16 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import collections
+import hashlib
 import yaml
-import copy
+
+
+# use the LibYAML-based loader when available: it's much faster
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# maximum number of entries in each memoization cache
+_CACHE_MAX_SIZE = 1024
 
 
 class UnknownSourceFormat(Exception):
@@ -205,7 +213,7 @@ def _source_from_project_node(project_node):
 
 
 def _merge_envs(enva, envb):
-    env = copy.deepcopy(enva)
+    env = dict(enva)
     env.update(envb)
 
     return env
@@ -228,7 +236,7 @@ def _project_from_project_node(name, project_node, base_build_env):
         if build_env_node is not None:
             build_env = _merge_envs(base_build_env, build_env_node)
     else:
-        build_env = copy.deepcopy(base_build_env)
+        build_env = dict(base_build_env)
 
     return Project(name, source, configure, build_env)
 
@@ -270,15 +278,86 @@ def _merge_nodes(base, patch):
                     base[k] = v
 
 
-def _from_yaml_profiles(yaml_profiles, ignored_projects, overrides, verbose):
-    root_node = {}
+def _copy_node(node):
+    # much faster than copy.deepcopy() for plain YAML trees
+    if type(node) is dict:
+        return {k: _copy_node(v) for k, v in node.items()}
+
+    if type(node) is list:
+        return [_copy_node(v) for v in node]
+
+    return node
+
+
+def _cache_get(cache, key):
+    node = cache.get(key)
+
+    if node is not None:
+        cache.move_to_end(key)
+
+    return node
+
+
+def _cache_put(cache, key, node):
+    cache[key] = node
+
+    if len(cache) > _CACHE_MAX_SIZE:
+        cache.popitem(last=False)
+
+
+# content hash of a YAML profile -> parsed tree
+_parsed_cache = collections.OrderedDict()
+
+# hash of YAML profile content hashes and overrides -> effective tree
+_effective_cache = collections.OrderedDict()
+
 
-    for yaml_profile in yaml_profiles:
-        patch_root_node = yaml.load(yaml_profile, Loader=yaml.FullLoader)
-        _merge_nodes(root_node, patch_root_node)
+def _parse_yaml_profile(yaml_profile):
+    digest = hashlib.sha256(yaml_profile.encode()).digest()
+    node = _cache_get(_parsed_cache, digest)
+
+    if node is None:
+        node = yaml.load(yaml_profile, Loader=_YamlLoader)
+
+        if node is None:
+            node = {}
+
+        _cache_put(_parsed_cache, digest, node)
+
+    return digest, node
+
+
+def _effective_root_node(yaml_profiles, overrides):
+    parsed = [_parse_yaml_profile(p) for p in yaml_profiles]
+    key_hash = hashlib.sha256()
+
+    for digest, _ in parsed:
+        key_hash.update(digest)
 
     for override in overrides:
-        override.apply(root_node)
+        key_hash.update(repr((override.path, override.op, override.rep)).encode())
+
+    key = key_hash.digest()
+    root_node = _cache_get(_effective_cache, key)
+
+    if root_node is None:
+        root_node = {}
+
+        # merge copies: the cached parsed trees must not change
+        for _, patch_root_node in parsed:
+            _merge_nodes(root_node, _copy_node(patch_root_node))
+
+        for override in overrides:
+            override.apply(root_node)
+
+        _cache_put(_effective_cache, key, root_node)
+
+    # the caller may modify the returned tree
+    return _copy_node(root_node)
+
+
+def _from_yaml_profiles(yaml_profiles, ignored_projects, overrides, verbose):
+    root_node = _effective_root_node(yaml_profiles, overrides)
 
     if verbose:
         print('Effective profile:')
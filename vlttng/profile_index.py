@@ -0,0 +1,338 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import functools
+import operator
+import bisect
+import os.path
+import vlttng
+import json
+import os
+import re
+
+
+# name of the index resource, next to the profile archive
+INDEX_FILENAME = 'profile-index.json'
+
+_BRANCH_RE = re.compile(r'^(?P<series>.+?)-(?P<branch>master|stable-\d+(?:\.\d+)*)$')
+_RELEASE_RE = re.compile(r'^(?P<series>.+?)-(?P<version>\d+(?:\.\d+)*(?:-(?:pre|rc)\d+)?)$')
+_VERSION_RE = re.compile(r'^(?P<nums>\d+(?:\.\d+)*)(?:-(?P<pre>pre|rc)(?P<pre_num>\d+))?$')
+
+
+def version_key(version):
+    m = _VERSION_RE.match(version)
+
+    if not m:
+        raise ValueError('Invalid version: "{}"'.format(version))
+
+    # `2.0` and `2.0.0` are the same version
+    nums = tuple(int(n) for n in m.group('nums').split('.'))
+    nums += (0,) * (4 - len(nums))
+
+    # `-pre` < `-rc` < release
+    if m.group('pre') is None:
+        pre = (2, 0)
+    elif m.group('pre') == 'pre':
+        pre = (0, int(m.group('pre_num')))
+    else:
+        pre = (1, int(m.group('pre_num')))
+
+    return nums + pre
+
+
+class InvalidSpecifier(Exception):
+    def __init__(self, spec, reason):
+        super().__init__('Cannot resolve "{}": {}'.format(spec, reason))
+
+
+_COMPARATOR_FUNCS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+}
+
+
+def _next_key(version, part):
+    # smallest version key above all the `version` versions sharing
+    # its first `part` numbers (`~2.13` -> `2.14`, `^2.13` -> `3`)
+    nums = [int(n) for n in version.split('.')][:part]
+    nums[-1] += 1
+    return version_key('.'.join(str(n) for n in nums) + '-pre0')
+
+
+def _parse_constraint(spec, constraint):
+    comparators = []
+
+    if constraint == 'latest':
+        return comparators
+
+    for item in constraint.split(','):
+        item = item.strip()
+        m = re.match(r'^(==|!=|>=|<=|>|<|=|~|\^)?\s*(\d+(?:\.\d+)*(?:-(?:pre|rc)\d+)?)$', item)
+
+        if not m:
+            raise InvalidSpecifier(spec, 'invalid constraint "{}"'.format(item))
+
+        op = m.group(1) or '=='
+        version = m.group(2)
+
+        if op == '=':
+            op = '=='
+
+        if op in ('~', '^'):
+            if is_prerelease(version):
+                raise InvalidSpecifier(spec, 'prerelease in "{}"'.format(item))
+
+            # `~X` -> `X.*`, `~X.Y[.Z]` -> `X.Y.*`, `^X[.Y[.Z]]` -> `X.*`
+            part = 1 if op == '^' else min(2, version.count('.') + 1)
+            comparators.append(('>=', version_key(version), version))
+            comparators.append(('<', _next_key(version, part), version))
+        else:
+            comparators.append((op, version_key(version), version))
+
+    return comparators
+
+
+def is_prerelease(version):
+    return '-' in version
+
+
+def _branch_key(branch):
+    if branch == 'master':
+        return (0,)
+
+    return (1,) + version_key(branch[len('stable-'):])
+
+
+def profile_name(series, version):
+    return '{}-{}'.format(series, version)
+
+
+class ProfileIndex:
+    def __init__(self, releases, branches, others):
+        self._releases = releases
+        self._branches = branches
+        self._others = others
+        self._names = None
+        self._release_keys_cache = {}
+
+    # series name (for example, `lttng-tools`) to versions, sorted
+    # semantically (oldest first)
+    @property
+    def releases(self):
+        return self._releases
+
+    # series name to branch names (for example, `master`, `stable-2.13`)
+    @property
+    def branches(self):
+        return self._branches
+
+    # feature/fragment profile names (for example, `debug-flags`)
+    @property
+    def others(self):
+        return self._others
+
+    @property
+    def names(self):
+        if self._names is None:
+            names = set(self._others)
+
+            for series, versions in self._releases.items():
+                names.update(profile_name(series, v) for v in versions)
+
+            for series, branches in self._branches.items():
+                names.update(profile_name(series, b) for b in branches)
+
+            self._names = frozenset(names)
+
+        return self._names
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def _release_keys(self, series):
+        keys = self._release_keys_cache.get(series)
+
+        if keys is None:
+            keys = [version_key(v) for v in self._releases.get(series, [])]
+            self._release_keys_cache[series] = keys
+
+        return keys
+
+    def resolve(self, spec):
+        series, sep, constraint = spec.partition('@')
+
+        if not sep or not series or not constraint:
+            raise InvalidSpecifier(spec, 'expecting `SERIES@CONSTRAINT`')
+
+        if constraint in self._branches.get(series, []):
+            return profile_name(series, constraint)
+
+        if series not in self._releases:
+            raise InvalidSpecifier(spec, 'no "{}" releases'.format(series))
+
+        versions = self._releases[series]
+        keys = self._release_keys(series)
+        comparators = _parse_constraint(spec, constraint)
+        want_prerelease = any(is_prerelease(v) for _, _, v in comparators)
+
+        # the versions are sorted: start from the highest one which the
+        # upper bound accepts and walk down to the first match
+        index = len(versions)
+
+        for op, key, _ in comparators:
+            if op in ('<', '<=', '=='):
+                bisect_func = bisect.bisect_left if op == '<' else bisect.bisect_right
+                index = min(index, bisect_func(keys, key))
+
+        for i in range(index - 1, -1, -1):
+            if is_prerelease(versions[i]) and not want_prerelease:
+                continue
+
+            if all(_COMPARATOR_FUNCS[op](keys[i], key) for op, key, _ in comparators):
+                return profile_name(series, versions[i])
+
+        raise InvalidSpecifier(spec, 'no matching version')
+
+    def to_json(self):
+        return json.dumps({
+            'releases': self._releases,
+            'branches': self._branches,
+            'others': self._others,
+        }, sort_keys=True, separators=(',', ':'))
+
+    @staticmethod
+    def from_json(text):
+        node = json.loads(text)
+        return ProfileIndex(node['releases'], node['branches'],
+                            node['others'])
+
+
+def create(names):
+    releases = {}
+    branches = {}
+    others = []
+
+    for name in names:
+        m = _BRANCH_RE.match(name)
+
+        if m:
+            branches.setdefault(m.group('series'), []).append(m.group('branch'))
+            continue
+
+        m = _RELEASE_RE.match(name)
+
+        if m:
+            releases.setdefault(m.group('series'), []).append(m.group('version'))
+            continue
+
+        others.append(name)
+
+    # the profile name breaks ties (`2.0-rc4` and `2.0.0-rc4`, for
+    # example) so that the index doesn't depend on the order of `names`
+    for series, versions in releases.items():
+        versions.sort(key=lambda v: (version_key(v), profile_name(series, v)))
+
+    for series, series_branches in branches.items():
+        series_branches.sort(key=lambda b: (_branch_key(b), profile_name(series, b)))
+
+    return ProfileIndex(releases, branches, sorted(others))
+
+
+def _open_resource(name):
+    # Open the package file directly when it exists: importing
+    # `importlib.resources` alone costs more than reading the whole
+    # profile index.
+    path = os.path.join(os.path.dirname(vlttng.__file__), name)
+
+    if os.path.isfile(path):
+        return open(path, 'rb')
+
+    import importlib.resources
+
+    res = importlib.resources.files(vlttng) / name
+
+    if not res.is_file():
+        return
+
+    return res.open('rb')
+
+
+# The bundled profiles are the `NAME.yml` members of a single ZIP
+# archive: its central directory, read once, is the name-to-member
+# index, so that finding a profile doesn't touch the file system.
+@functools.lru_cache(maxsize=None)
+def _archive():
+    import zipfile
+
+    return zipfile.ZipFile(_open_resource(vlttng._PROFILES_ARCHIVE_FILENAME))
+
+
+def archive_profile_names():
+    names = []
+
+    for member in _archive().namelist():
+        if member.endswith('.yml'):
+            names.append(member[:-4])
+
+    return names
+
+
+def _load():
+    f = _open_resource(INDEX_FILENAME)
+
+    if f is not None:
+        with f:
+            return ProfileIndex.from_json(f.read())
+
+    # no prebuilt index: build it from the archive
+    return create(archive_profile_names())
+
+
+@functools.lru_cache(maxsize=None)
+def load():
+    return _load()
+
+
+def read_profile(name):
+    return _archive().read('{}.yml'.format(name)).decode()
+
+
+def write_archive(profiles_dir, path):
+    import zipfile
+
+    filenames = sorted(f for f in os.listdir(profiles_dir) if f.endswith('.yml'))
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for filename in filenames:
+            # fixed timestamp for a reproducible archive
+            info = zipfile.ZipInfo(filename, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+
+            with open(os.path.join(profiles_dir, filename), 'rb') as f:
+                zf.writestr(info, f.read())
+
+    return create([f[:-4] for f in filenames])
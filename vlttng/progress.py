@@ -0,0 +1,146 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# Progress view: shows the active steps with their elapsed and estimated
+# remaining times (from the duration history).
+#
+# On a terminal, a background thread redraws a block of lines below the
+# messages at a fixed, low rate: the cost doesn't depend on the amount
+# of command output. Otherwise, the view prints one plain line when a
+# step begins and when it ends.
+
+import vlttng.events
+import threading
+import sys
+from vlttng.utils import fmt_duration
+
+
+# seconds between two redraws of the live view
+_REFRESH_PERIOD = .5
+
+
+class ProgressView(vlttng.events.Listener):
+    # `history` estimates the durations (`None` for no estimation);
+    # `live` is `None` to only use a live view on a terminal
+    def __init__(self, history=None, stream=None, live=None):
+        self._history = history
+        self._stream = stream or sys.stdout
+        self._live = self._stream.isatty() if live is None else live
+        self._steps = []
+        self._drawn_line_count = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        if self._live:
+            self._thread = threading.Thread(target=self._refresh,
+                                            name='vlttng-progress',
+                                            daemon=True)
+            self._thread.start()
+
+    def _estimate(self, step):
+        if self._history is None:
+            return
+
+        return self._history.estimate(step.project, step.phase, step.jobs)
+
+    def _step_line(self, step):
+        line = '  {:<16} {:<10} {:>8}'.format(step.project, step.phase,
+                                              fmt_duration(step.duration))
+        estimate = self._estimate(step)
+
+        if estimate is not None:
+            remaining = estimate - step.duration
+
+            if remaining >= 0:
+                line += '  ~{} left'.format(fmt_duration(remaining))
+            else:
+                line += '  {} over estimate'.format(fmt_duration(-remaining))
+
+        return line
+
+    def _clear(self):
+        if self._drawn_line_count:
+            # beginning of the first drawn line, then clear until the
+            # end of the screen
+            self._stream.write('\x1b[{}F\x1b[J'.format(self._drawn_line_count))
+            self._drawn_line_count = 0
+
+    def _draw(self):
+        self._clear()
+        lines = [self._step_line(step) for step in self._steps]
+
+        for line in lines:
+            self._stream.write(line + '\n')
+
+        self._drawn_line_count = len(lines)
+        self._stream.flush()
+
+    def _refresh(self):
+        while not self._stop.wait(_REFRESH_PERIOD):
+            with self._lock:
+                self._draw()
+
+    def _print(self, text):
+        with self._lock:
+            self._clear()
+            self._stream.write(text + '\n')
+
+            if self._live:
+                self._draw()
+            else:
+                self._stream.flush()
+
+    def on_step_begin(self, step):
+        with self._lock:
+            self._steps.append(step)
+
+        if not self._live:
+            msg = '# {} {}: begin'.format(step.project, step.phase)
+            estimate = self._estimate(step)
+
+            if estimate is not None:
+                msg += ' (estimated: {})'.format(fmt_duration(estimate))
+
+            self._print(msg)
+
+    def on_step_end(self, step):
+        with self._lock:
+            self._steps.remove(step)
+
+        status = 'done' if step.ok else 'FAILED'
+        self._print('# {} {}: {} in {}'.format(step.project, step.phase, status,
+                                               fmt_duration(step.duration)))
+
+    def on_message(self, msg):
+        self._print(msg)
+
+    def on_close(self):
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+        with self._lock:
+            self._clear()
+            self._stream.flush()
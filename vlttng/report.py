@@ -0,0 +1,181 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# `vlttng report`: critical path analysis of the build of a virtual
+# environment from the recorded step durations (see `history.py`) and
+# the project dependency graph (see `update.py`).
+#
+# The model: a project can start when all its dependencies are
+# installed, and its duration is the sum of its recorded steps. With
+# enough CPUs, the wall-clock time is the length of the longest chain
+# (the critical path); a project's slack is how much longer it could
+# take without making the build longer.
+
+from vlttng.utils import fmt_duration, perror
+
+
+# phases of which the duration scales with the number of make jobs
+_PARALLEL_PHASES = ('build',)
+
+
+class Analysis:
+    def __init__(self, durations, deps, order):
+        self.durations = durations
+        self.deps = deps
+        self.order = order
+        self.earliest_finish = {}
+        self.slack = {}
+        self.makespan = 0
+        self.critical_path = []
+        self._analyze()
+
+    def _analyze(self):
+        ef = self.earliest_finish
+
+        # `order` is a topological order (build order)
+        for name in self.order:
+            start = max((ef[d] for d in self.deps[name]), default=0)
+            ef[name] = start + self.durations[name]
+
+        self.makespan = max(ef.values(), default=0)
+        latest_finish = {}
+
+        for name in reversed(self.order):
+            dependents = [d for d in self.order if name in self.deps[d]]
+            latest_finish[name] = min((latest_finish[d] - self.durations[d]
+                                       for d in dependents),
+                                      default=self.makespan)
+            self.slack[name] = latest_finish[name] - ef[name]
+
+        # walk back from the last finishing project through the
+        # dependencies which finish last
+        name = max(self.order, key=lambda n: ef[n], default=None)
+
+        while name is not None:
+            self.critical_path.insert(0, name)
+            name = max(self.deps[name], key=lambda d: ef[d], default=None)
+
+    @property
+    def sequential(self):
+        return sum(self.durations.values())
+
+
+def _project_durations(steps, names, cores_factor=1):
+    durations = {}
+
+    for name in names:
+        total = 0
+
+        for phase, (duration, _) in steps.get(name, {}).items():
+            if phase in _PARALLEL_PHASES:
+                duration /= cores_factor
+
+            total += duration
+
+        durations[name] = total
+
+    return durations
+
+
+def _speedup(base, new):
+    if new <= 0:
+        return 'n/a'
+
+    return '{:.2f}x'.format(base / new)
+
+
+def report(venv_path):
+    import vlttng.history
+    import vlttng.update
+
+    try:
+        manifest = vlttng.update.load_manifest(venv_path)
+    except FileNotFoundError:
+        perror('"{}" is not a vlttng virtual environment or was created by an older vlttng (missing "{}")'.format(venv_path,
+                                                                                                                 vlttng.update.manifest_path(venv_path)))
+
+    steps = vlttng.history.latest_steps(venv_path)
+
+    if not steps:
+        perror('No recorded step for "{}" in "{}"'.format(venv_path,
+                                                          vlttng.history.db_path()))
+
+    order = [p['name'] for p in manifest]
+    deps = {p['name']: [d for d in p['deps'] if d in order] for p in manifest}
+    missing = [name for name in order if name not in steps]
+    base = Analysis(_project_durations(steps, order), deps, order)
+
+    print('Virtual environment: {}'.format(venv_path))
+
+    if missing:
+        print('Projects without recorded steps (counted as 0:00): {}'.format(', '.join(missing)))
+
+    print()
+    print('Sequential build (vlttng):  {}'.format(fmt_duration(base.sequential)))
+    print('Critical path:              {} ({} of the sequential build)'.format(fmt_duration(base.makespan),
+                                                                            _speedup(base.sequential, base.makespan)))
+    print('                            {}'.format(' -> '.join(base.critical_path)))
+    print()
+    print('{:<16} {:>9} {:>9} {:>9}  {}'.format('Project', 'Duration', 'Finish', 'Slack',
+                                                'Steps'))
+
+    for name in order:
+        step_strs = ['{} {}'.format(phase, fmt_duration(duration))
+                     for phase, (duration, _) in steps.get(name, {}).items()]
+        print('{:<16} {:>9} {:>9} {:>9}  {}'.format(name,
+                                                    fmt_duration(base.durations[name]),
+                                                    fmt_duration(base.earliest_finish[name]),
+                                                    fmt_duration(base.slack[name]),
+                                                    ', '.join(step_strs)))
+
+    # more CPUs: only the build steps get faster
+    print()
+    print('With more CPUs (build steps scale with the number of make jobs):')
+
+    for factor in (2, 4):
+        analysis = Analysis(_project_durations(steps, order, factor), deps, order)
+        print('  {}x CPUs: critical path {} ({}), sequential build {} ({})'.format(factor,
+                                                                                  fmt_duration(analysis.makespan),
+                                                                                  _speedup(base.makespan, analysis.makespan),
+                                                                                  fmt_duration(analysis.sequential),
+                                                                                  _speedup(base.sequential, analysis.sequential)))
+
+    # caching a project: it takes no time
+    print()
+    print('With a cached (prebuilt) project:')
+    savings = []
+
+    for name in order:
+        durations = dict(base.durations)
+        durations[name] = 0
+        analysis = Analysis(durations, deps, order)
+        savings.append((base.makespan - analysis.makespan, name, analysis))
+
+    savings.sort(key=lambda s: (-s[0], order.index(s[1])))
+
+    for saving, name, analysis in savings:
+        print('  {:<16} critical path {} ({}), sequential build {} ({})'.format(name,
+                                                                               fmt_duration(analysis.makespan),
+                                                                               _speedup(base.makespan, analysis.makespan),
+                                                                               fmt_duration(analysis.sequential),
+                                                                               _speedup(base.sequential, analysis.sequential)))
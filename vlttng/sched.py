@@ -0,0 +1,130 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# A dependency-aware task scheduler which runs independent tasks
+# concurrently and splits a single make job budget between the running
+# tasks.
+#
+# A task may only start when all its dependencies succeeded: when a task
+# fails, its direct and indirect dependents are skipped.
+
+import threading
+
+
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class Scheduler:
+    # `deps` maps each task name to the names of the tasks it depends
+    # on, `order` is the preferred start order of ready tasks, `run_task`
+    # is called as `run_task(name, jobs)` from a worker thread and
+    # returns whether or not the task succeeded, and `jobs` is the total
+    # make job budget (`None` means unlimited).
+    def __init__(self, deps, order, run_task, jobs):
+        self._deps = {name: set(d for d in task_deps if d in deps)
+                      for name, task_deps in deps.items()}
+        self._order = [name for name in order if name in deps]
+        self._order += sorted(set(deps) - set(self._order))
+        self._run_task = run_task
+        self._jobs = jobs
+        self._results = {}
+        self._running = {}
+        self._cond = threading.Condition()
+
+    def _free_jobs(self):
+        return self._jobs - sum(self._running.values())
+
+    def _ready_tasks(self):
+        ready = []
+
+        for name in self._order:
+            if name in self._results or name in self._running:
+                continue
+
+            dep_results = [self._results.get(d) for d in self._deps[name]]
+
+            if any(r in (FAILED, SKIPPED) for r in dep_results):
+                self._results[name] = SKIPPED
+                continue
+
+            if all(r == SUCCEEDED for r in dep_results):
+                ready.append(name)
+
+        return ready
+
+    def _task_jobs(self, ready_count):
+        if self._jobs is None:
+            return
+
+        # share what's left between the ready tasks, but always give at
+        # least one job to a task
+        return max(1, self._free_jobs() // ready_count)
+
+    def _worker(self, name, jobs):
+        ok = False
+
+        try:
+            ok = self._run_task(name, jobs)
+        except Exception as e:
+            from vlttng.venv import _pwarn
+
+            _pwarn('Unexpected error while running {}: {}: {}'.format(name,
+                                                                      type(e).__name__,
+                                                                      e))
+        finally:
+            # also after a `SystemExit` (`perror()`): `run()` waits for
+            # all the running tasks
+            with self._cond:
+                del self._running[name]
+                self._results[name] = SUCCEEDED if ok else FAILED
+                self._cond.notify()
+
+    def run(self):
+        with self._cond:
+            while True:
+                # a skipped task may make other tasks skipped: loop
+                # until the result set is stable
+                while True:
+                    result_count = len(self._results)
+                    ready = self._ready_tasks()
+
+                    if len(self._results) == result_count:
+                        break
+
+                for index, name in enumerate(ready):
+                    if self._running and self._jobs is not None and self._free_jobs() <= 0:
+                        break
+
+                    jobs = self._task_jobs(len(ready) - index)
+                    self._running[name] = jobs if jobs is not None else 0
+                    threading.Thread(target=self._worker, args=(name, jobs),
+                                     daemon=True).start()
+
+                if not self._running:
+                    break
+
+                self._cond.wait()
+
+        return self._results
@@ -0,0 +1,353 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# Self-tracing: records the build events of vlttng (steps, commands,
+# cache lookups, downloads, and periodic resource usage samples) as a
+# CTF 1.8 trace which `babeltrace2` and Trace Compass can read.
+#
+# The trace has a single data stream. All the integers are byte-aligned
+# and little-endian so that the writer only needs `struct`: a packet is
+# its header and context followed by the packed event records. The
+# event timestamps are the values of the monotonic clock, which the
+# metadata maps to the real time with its offset.
+
+import vlttng.events
+import threading
+import resource
+import os.path
+import socket
+import struct
+import time
+import uuid
+import os
+
+
+# period of the resource usage samples (seconds)
+_SAMPLE_PERIOD = 1
+
+# flush the event records when the current packet reaches this size
+_MAX_PACKET_SIZE = 64 * 1024
+
+_CTF_MAGIC = 0xc1fc1fc1
+_STREAM_FILENAME = 'stream'
+_METADATA_FILENAME = 'metadata'
+
+_TYPE_NAMES = {
+    'u8': 'uint8_t',
+    'u64': 'uint64_t',
+    'i64': 'int64_t',
+    'string': 'string',
+}
+
+_TYPE_FMTS = {
+    'u8': '<B',
+    'u64': '<Q',
+    'i64': '<q',
+}
+
+# event class name to field names and types (the event class ID is
+# the index)
+_EVENT_CLASSES = [
+    ('vlttng:step_begin', [('project', 'string'), ('phase', 'string'),
+                           ('jobs', 'i64')]),
+    ('vlttng:step_end', [('project', 'string'), ('phase', 'string'),
+                         ('ok', 'u8'), ('duration_ns', 'u64')]),
+    ('vlttng:command', [('project', 'string'), ('phase', 'string'),
+                        ('cmd', 'string')]),
+    ('vlttng:cache_lookup', [('cache', 'string'), ('key', 'string'),
+                             ('hit', 'u8')]),
+    ('vlttng:download', [('project', 'string'), ('size', 'u64')]),
+    ('vlttng:resource_sample', [('maxrss_self', 'u64'),
+                                ('maxrss_children', 'u64'),
+                                ('utime_self_ns', 'u64'),
+                                ('stime_self_ns', 'u64'),
+                                ('utime_children_ns', 'u64'),
+                                ('stime_children_ns', 'u64')]),
+    ('vlttng:message', [('msg', 'string')]),
+    ('vlttng:run_end', [('ok', 'u8')]),
+]
+
+_EVENT_CLASS_IDS = {name: i for i, (name, _) in enumerate(_EVENT_CLASSES)}
+
+_METADATA_HEADER = '''/* CTF 1.8 */
+
+typealias integer {{ size = 8; align = 8; signed = false; }} := uint8_t;
+typealias integer {{ size = 32; align = 8; signed = false; }} := uint32_t;
+typealias integer {{ size = 64; align = 8; signed = false; }} := uint64_t;
+typealias integer {{ size = 64; align = 8; signed = true; }} := int64_t;
+
+trace {{
+    major = 1;
+    minor = 8;
+    uuid = "{uuid}";
+    byte_order = le;
+    packet.header := struct {{
+        uint32_t magic;
+        uint8_t uuid[16];
+        uint32_t stream_id;
+    }};
+}};
+
+env {{
+    domain = "vlttng";
+    tracer_name = "vlttng";
+    hostname = "{hostname}";
+    vlttng_version = "{version}";
+    command = "{command}";
+    venv = "{venv}";
+}};
+
+clock {{
+    name = monotonic;
+    description = "Monotonic clock";
+    freq = 1000000000;
+    offset_s = {offset_s};
+    offset = {offset};
+}};
+
+typealias integer {{
+    size = 64; align = 8; signed = false;
+    map = clock.monotonic.value;
+}} := uint64_clock_monotonic_t;
+
+stream {{
+    id = 0;
+    packet.context := struct {{
+        uint64_clock_monotonic_t timestamp_begin;
+        uint64_clock_monotonic_t timestamp_end;
+        uint64_t content_size;
+        uint64_t packet_size;
+    }};
+    event.header := struct {{
+        uint32_t id;
+        uint64_clock_monotonic_t timestamp;
+    }};
+}};
+'''
+
+
+def _tsdl_str(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _metadata(trace_uuid, command, venv_path):
+    import vlttng
+
+    # real time = monotonic time + offset
+    offset_ns = time.time_ns() - time.monotonic_ns()
+    lines = [_METADATA_HEADER.format(uuid=trace_uuid,
+                                     hostname=_tsdl_str(socket.gethostname()),
+                                     version=_tsdl_str(vlttng.__version__),
+                                     command=_tsdl_str(command),
+                                     venv=_tsdl_str(venv_path),
+                                     offset_s=offset_ns // 10**9,
+                                     offset=offset_ns % 10**9)]
+
+    for id, (name, fields) in enumerate(_EVENT_CLASSES):
+        lines.append('event {')
+        lines.append('    name = "{}";'.format(name))
+        lines.append('    id = {};'.format(id))
+        lines.append('    stream_id = 0;')
+        lines.append('    fields := struct {')
+
+        for field_name, field_type in fields:
+            lines.append('        {} {};'.format(_TYPE_NAMES[field_type],
+                                                 field_name))
+
+        lines.append('    };')
+        lines.append('};')
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def _encode_field(field_type, value):
+    if field_type == 'string':
+        value = '' if value is None else str(value)
+        return value.encode(errors='replace').replace(b'\0', b'') + b'\0'
+
+    return struct.pack(_TYPE_FMTS[field_type], value)
+
+
+# writes the CTF trace directory `path` (created on the first flush)
+class _TraceWriter:
+    def __init__(self, path, command, venv_path):
+        self._path = path
+        self._uuid = uuid.uuid4()
+        self._metadata = _metadata(self._uuid, command, venv_path)
+        self._stream = None
+        self._records = []
+        self._records_size = 0
+        self._first_ts = None
+        self._last_ts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path
+
+    def emit(self, name, *values):
+        id = _EVENT_CLASS_IDS[name]
+        fields = _EVENT_CLASSES[id][1]
+
+        with self._lock:
+            # the timestamps of a stream must not decrease
+            ts = max(time.monotonic_ns(), self._last_ts)
+            self._last_ts = ts
+
+            if self._first_ts is None:
+                self._first_ts = ts
+
+            record = [struct.pack('<IQ', id, ts)]
+
+            for (_, field_type), value in zip(fields, values):
+                record.append(_encode_field(field_type, value))
+
+            record = b''.join(record)
+            self._records.append(record)
+            self._records_size += len(record)
+
+            if self._records_size >= _MAX_PACKET_SIZE:
+                self._flush()
+
+    def _flush(self):
+        if not self._records:
+            return
+
+        if self._stream is None:
+            os.makedirs(self._path, exist_ok=True)
+
+            with open(os.path.join(self._path, _METADATA_FILENAME), 'w') as f:
+                f.write(self._metadata)
+
+            self._stream = open(os.path.join(self._path, _STREAM_FILENAME),
+                                'wb')
+
+        header = struct.pack('<I16sI', _CTF_MAGIC, self._uuid.bytes, 0)
+        context_size = struct.calcsize('<QQQQ')
+        size_bits = (len(header) + context_size + self._records_size) * 8
+        context = struct.pack('<QQQQ', self._first_ts, self._last_ts,
+                              size_bits, size_bits)
+        self._stream.write(header + context + b''.join(self._records))
+        self._stream.flush()
+        self._records = []
+        self._records_size = 0
+        self._first_ts = None
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+
+# writes a trace of `event_count` events of all the event classes to
+# the directory `path` (training workload of `--pgo`)
+def write_training_trace(path, event_count):
+    writer = _TraceWriter(path, 'training', '')
+    projects = ('urcu', 'lttng-ust', 'lttng-tools', 'babeltrace2')
+    phases = ('fetch', 'conf', 'build', 'install')
+
+    for i in range(event_count // 4):
+        project = projects[i % len(projects)]
+        phase = phases[i // len(projects) % len(phases)]
+        writer.emit('vlttng:step_begin', project, phase, i % 16)
+        writer.emit('vlttng:command', project, phase,
+                    'make -j{} V=1 # {}'.format(i % 16, i))
+        writer.emit('vlttng:resource_sample', i * 4096, i * 8192, i * 1000,
+                    i * 500, i * 2000, i * 1000)
+        writer.emit('vlttng:step_end', project, phase, i % 2, i * 1000)
+
+    writer.close()
+
+
+def trace_path(venv_path, command):
+    name = '{}-{}'.format(command, time.strftime('%Y%m%d-%H%M%S'))
+    return os.path.join(venv_path, 'traces', name)
+
+
+class SelfTracer(vlttng.events.Listener):
+    # `command` is `create` or `update`
+    def __init__(self, venv_path, command):
+        self._writer = _TraceWriter(trace_path(venv_path, command), command,
+                                    venv_path)
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop,
+                                         daemon=True)
+        self._sampler.start()
+
+    @property
+    def path(self):
+        return self._writer.path
+
+    def _sample(self):
+        rself = resource.getrusage(resource.RUSAGE_SELF)
+        rchildren = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        # `ru_maxrss` is in kibibytes on Linux
+        self._writer.emit('vlttng:resource_sample',
+                          rself.ru_maxrss * 1024, rchildren.ru_maxrss * 1024,
+                          int(rself.ru_utime * 1e9), int(rself.ru_stime * 1e9),
+                          int(rchildren.ru_utime * 1e9),
+                          int(rchildren.ru_stime * 1e9))
+
+    def _sample_loop(self):
+        while not self._stop.wait(_SAMPLE_PERIOD):
+            self._sample()
+
+    def on_step_begin(self, step):
+        jobs = -1 if step.jobs is None else step.jobs
+        self._writer.emit('vlttng:step_begin', step.project, step.phase, jobs)
+
+    def on_step_end(self, step):
+        duration_ns = step.end_ns - step.begin_ns
+        self._writer.emit('vlttng:step_end', step.project, step.phase,
+                          int(bool(step.ok)), duration_ns)
+        self._writer.flush()
+
+    def on_command(self, project, phase, cmd):
+        self._writer.emit('vlttng:command', project, phase, cmd)
+
+    def on_cache_lookup(self, cache, key, hit):
+        self._writer.emit('vlttng:cache_lookup', cache, key, int(hit))
+
+    def on_download(self, project, size):
+        self._writer.emit('vlttng:download', project, size)
+
+    def on_message(self, msg):
+        self._writer.emit('vlttng:message', msg)
+
+    def on_run_end(self, ok):
+        self._sample()
+        self._writer.emit('vlttng:run_end', int(ok))
+
+    def on_close(self):
+        self._stop.set()
+        self._sampler.join()
+        self._writer.close()
@@ -0,0 +1,169 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# Compiler and linker selection for the C/C++ projects.
+#
+# A `Toolchain` is a compiler (`gcc` or `clang`, or `None` to keep the
+# one of the profile) and a linker (`mold`, `lld`, `gold`, or `bfd`, or
+# `None` to keep the default one of the compiler). `vlttng` only selects
+# a linker once a trivial program and shared library link with it:
+# a compiler driver which doesn't know `-fuse-ld=mold`, for example, or
+# an installed `ld.lld` which can't link for the host, makes `vlttng`
+# fall back to the next candidate.
+
+import tempfile
+import subprocess
+import os.path
+import os
+import re
+
+
+COMPILERS = ('gcc', 'clang')
+LINKERS = ('mold', 'lld', 'gold', 'bfd')
+
+# candidates of `--linker=auto`, fastest first
+AUTO_LINKERS = ('mold', 'lld', 'gold')
+
+_CXX_COMPILERS = {
+    'gcc': 'g++',
+    'clang': 'clang++',
+}
+
+# word in the output of `CC -Wl,--version` for each linker
+_LINKER_SIGNATURES = {
+    'mold': 'mold',
+    'lld': 'LLD',
+    'gold': 'GNU gold',
+    'bfd': 'GNU ld',
+}
+
+_TEST_PROGRAM = 'int vlttng_test(void) { return 0; }\nint main(void) { return vlttng_test(); }\n'
+
+
+class Toolchain:
+    def __init__(self, compiler=None, linker=None):
+        self._compiler = compiler
+        self._linker = linker
+
+    @property
+    def compiler(self):
+        return self._compiler
+
+    @property
+    def linker(self):
+        return self._linker
+
+    # cache key part (`clang+lld`, or `cc+mold` with the compiler of the
+    # profile, for example)
+    @property
+    def key(self):
+        return '{}+{}'.format(self._compiler or 'cc',
+                              self._linker or 'default')
+
+    # applies this toolchain to the build environment `env` (modified)
+    def apply(self, env):
+        if self._compiler is not None:
+            env['CC'] = self._compiler
+            env['CXX'] = _CXX_COMPILERS[self._compiler]
+
+        if self._linker is not None:
+            ldflags = env.get('LDFLAGS', os.environ.get('LDFLAGS', ''))
+            ldflags = re.sub(r'(^|\s)-fuse-ld=\S*', '', ldflags)
+            env['LDFLAGS'] = '{} -fuse-ld={}'.format(ldflags, self._linker).strip()
+
+    # extra `make` arguments to build kernel modules with the kernel
+    # compiler `kernel_compiler` (`gcc` or `clang`)
+    def kbuild_args(self, kernel_compiler):
+        args = []
+
+        # Kbuild links with `$(LD)` directly and only supports the
+        # linkers of the kernel toolchains
+        if self._linker == 'lld':
+            args.append('LD=ld.lld')
+
+        # external modules must use the compiler of the kernel
+        if self._compiler == 'clang' and kernel_compiler == 'clang':
+            args.append('CC=clang')
+
+        return args
+
+
+def _run(cmd, env, cwd):
+    try:
+        return subprocess.run(cmd, shell=True, env=env, cwd=cwd,
+                              stdin=subprocess.DEVNULL,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT,
+                              universal_newlines=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return
+
+
+# checks that the compiler `cc` (command line) of the environment `env`
+# (with the `CFLAGS` and `LDFLAGS` to test) builds a program and a
+# shared library, and, if `linker` isn't `None`, that it links them with
+# this linker
+def check(cc, env, linker=None):
+    flags = '$CFLAGS $LDFLAGS'
+
+    if linker is not None:
+        flags += ' -fuse-ld={}'.format(linker)
+
+    with tempfile.TemporaryDirectory(prefix='vlttng-toolchain-') as tmp_dir:
+        with open(os.path.join(tmp_dir, 'test.c'), 'w') as f:
+            f.write(_TEST_PROGRAM)
+
+        cmds = [
+            '{} {} -o test test.c'.format(cc, flags),
+            '{} {} -fPIC -shared -o libtest.so test.c'.format(cc, flags),
+            './test',
+        ]
+
+        for cmd in cmds:
+            res = _run(cmd, env, tmp_dir)
+
+            if res is None or res.returncode != 0:
+                return False
+
+        if linker is None:
+            return True
+
+        res = _run('{} {} -Wl,--version -o test test.c'.format(cc, flags),
+                   env, tmp_dir)
+
+        return res is not None and _LINKER_SIGNATURES[linker] in res.stdout
+
+
+# compiler of the running kernel (`gcc`, `clang`, or `None` if unknown)
+def kernel_compiler():
+    try:
+        with open('/proc/version') as f:
+            version = f.read()
+    except OSError:
+        return
+
+    if 'clang' in version:
+        return 'clang'
+
+    if 'gcc' in version:
+        return 'gcc'
@@ -0,0 +1,432 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# `vlttng update`: fetches all the Git projects of a virtual environment
+# concurrently, then updates the changed ones and rebuilds their
+# dependents, in dependency order, with a shared make job budget (see
+# `sched.py`).
+#
+# `VEnvCreator` writes the project manifest, which this module reads,
+# to the state directory of the virtual environment.
+#
+# After updating or rebuilding a project, `vlttng update` compares its
+# installed interface with the recorded one (see `abi.py`): a dependent
+# of which no dependency changed its interface is up to date.
+
+import concurrent.futures
+import vlttng.venv_env
+import vlttng.sched
+import vlttng.events
+import vlttng.abi
+import subprocess
+import os.path
+import json
+import time
+import os
+from vlttng.utils import perror, fmt_duration, tree_size
+
+
+MANIFEST_FILENAME = 'projects.json'
+
+
+def manifest_path(venv_path):
+    return os.path.join(vlttng.venv_env.state_dir(venv_path), MANIFEST_FILENAME)
+
+
+# path of the file containing the installed revision of the Git project
+# `name` (written by its update script)
+def rev_path(venv_path, name):
+    return os.path.join(vlttng.venv_env.state_dir(venv_path),
+                        'update-{}.rev'.format(name))
+
+
+# `projects` is a list of `(name, deps, gitref, configure)` in build
+# order; `gitref` is `None` for a project without a Git source and
+# `configure` is the configuration (configure flags and toolchain) of
+# the build history
+def write_manifest(venv_path, projects):
+    os.makedirs(vlttng.venv_env.state_dir(venv_path), exist_ok=True)
+    node = [{'name': name, 'deps': deps, 'gitref': gitref,
+             'configure': configure}
+            for name, deps, gitref, configure in projects]
+
+    with open(manifest_path(venv_path), 'w') as f:
+        json.dump(node, f, indent=2)
+
+
+def load_manifest(venv_path):
+    with open(manifest_path(venv_path)) as f:
+        return json.load(f)
+
+
+def _git(src_path, *args):
+    return subprocess.run(['git'] + list(args), cwd=src_path,
+                          stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+
+
+class _Updater:
+    def __init__(self, venv_path, jobs, verbose, compress_logs,
+                 metrics_file=None, self_trace=False, history=True):
+        self._venv_path = venv_path
+        self._jobs = jobs
+        self._verbose = verbose
+        self._compress_logs = compress_logs
+        self._metrics_file = metrics_file
+        self._self_trace = self_trace
+        self._history_enabled = history
+        self._events = vlttng.events.Hub()
+
+        try:
+            self._manifest = load_manifest(venv_path)
+        except FileNotFoundError:
+            perror('"{}" is not a vlttng virtual environment or was created by an older vlttng (missing "{}")'.format(venv_path,
+                                                                                                                     manifest_path(venv_path)))
+        except Exception as e:
+            perror('Cannot read the project manifest of "{}": {}'.format(venv_path, e))
+
+        self._projects = {p['name']: p for p in self._manifest}
+        self._order = [p['name'] for p in self._manifest]
+
+    def _src_path(self, name):
+        return os.path.join(self._venv_path, 'src', name)
+
+    def _script_path(self, step, name):
+        return os.path.join(self._venv_path, '{}-{}.bash'.format(step, name))
+
+    def _git_names(self):
+        return [name for name in self._order
+                if self._projects[name]['gitref'] is not None and
+                os.path.isfile(self._script_path('update', name))]
+
+    def _fetch(self, name):
+        git_dir = os.path.join(self._src_path(name), '.git')
+
+        with self._events.step(name, 'fetch') as step:
+            size = tree_size(git_dir)
+            self._events.command(name, 'fetch', 'git fetch --quiet origin')
+            proc = _git(self._src_path(name), 'fetch', '--quiet', 'origin')
+
+            if proc.returncode != 0:
+                step.ok = False
+                return proc.stderr.strip()
+
+            self._events.download(name, max(0, tree_size(git_dir) - size))
+
+    def _fetch_all(self, names):
+        from vlttng.venv import _pinfo, _pwarn
+
+        _pinfo('Fetch {}'.format(', '.join(names)))
+        errors = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(16, len(names))) as executor:
+            for name, error in zip(names, executor.map(self._fetch, names)):
+                if error is not None:
+                    errors[name] = error
+
+        for name, error in errors.items():
+            _pwarn('Cannot fetch {}: {}'.format(name, error))
+
+        return not errors
+
+    def _has_changed(self, name):
+        from vlttng.venv import _pwarn
+
+        src_path = self._src_path(name)
+        gitref = self._projects[name]['gitref']
+        spec = 'origin/{}^{{commit}}'.format(gitref)
+        new_rev = _git(src_path, 'rev-parse', '--verify', '--quiet', spec).stdout.strip()
+
+        if not new_rev:
+            # checked out at a tag or at a commit: nothing to follow
+            _pwarn('{} is not on a branch ({}): not updated'.format(name,
+                                                                    gitref))
+            return False
+
+        self._versions[name] = new_rev
+
+        try:
+            with open(rev_path(self._venv_path, name)) as f:
+                old_rev = f.read().strip()
+        except FileNotFoundError:
+            # not updated since the creation of the virtual environment
+            old_rev = _git(src_path, 'rev-parse', 'HEAD').stdout.strip()
+
+        if old_rev == new_rev:
+            self._versions[name] = old_rev
+
+        changed = new_rev != old_rev
+        self._events.cache_lookup('update', name, not changed)
+        return changed
+
+    def _dependents(self, names):
+        names = set(names)
+
+        # the manifest is in build order: one pass is enough
+        for name in self._order:
+            if names.intersection(self._projects[name]['deps']):
+                names.add(name)
+
+        return names
+
+    def _task_steps(self, name):
+        if name in self._changed:
+            return ['update']
+
+        return ['conf', 'build', 'install']
+
+    def _task_estimate(self, name):
+        estimates = [self._history.estimate(name, step)
+                     for step in self._task_steps(name)]
+        return sum(e for e in estimates if e is not None)
+
+    # Returns the names of the tasks `deps` (task to dependencies),
+    # highest first, by estimated length of the longest chain starting
+    # with it (its own estimated duration plus the longest chain of its
+    # dependents), and the longest chain.
+    #
+    # Starting the tasks of the critical path first minimizes the total
+    # duration.
+    def _critical_order(self, deps):
+        ranks = {}
+        nexts = {}
+
+        # reverse build order: dependents first
+        for name in reversed(self._order):
+            if name not in deps:
+                continue
+
+            dependents = [d for d in deps if name in deps[d]]
+            nexts[name] = max(dependents, key=lambda d: ranks[d], default=None)
+            ranks[name] = self._task_estimate(name)
+
+            if nexts[name] is not None:
+                ranks[name] += ranks[nexts[name]]
+
+        order = sorted(ranks, key=lambda n: (-ranks[n], self._order.index(n)))
+        path = []
+        name = order[0] if order else None
+
+        while name is not None:
+            path.append(name)
+            name = nexts[name]
+
+        return order, path, ranks.get(path[0], 0) if path else 0
+
+    def _run_script(self, name, step, env):
+        import vlttng.log
+
+        path = self._script_path(step, name)
+        log = vlttng.log.Log(vlttng.log.log_path(self._venv_path, name, step,
+                                                 self._compress_logs),
+                             self._compress_logs,
+                             '[{}] '.format(name) if self._verbose else None)
+        log.write_cmd(path)
+        self._events.command(name, step, path)
+
+        try:
+            proc = subprocess.Popen([path], env=env, stdin=subprocess.DEVNULL,
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT)
+
+            with proc.stdout:
+                log.write_from_fd(proc.stdout.fileno())
+
+            ok = proc.wait() == 0
+        finally:
+            log.close()
+
+        return ok, log
+
+    # `since_ns`: when the task started (nanoseconds since the epoch)
+    def _update_abi(self, name, since_ns):
+        from vlttng.venv import _pinfo
+
+        usr_path = os.path.join(self._venv_path, 'usr')
+        old = vlttng.abi.load(self._venv_path, name)
+
+        if old is None:
+            # unknown interface: assume it changed
+            self._abi_changed[name] = True
+            return
+
+        others = [vlttng.abi.load(self._venv_path, other)
+                  for other in self._order if other != name]
+        new = vlttng.abi.recompute(usr_path, old, since_ns,
+                                   [o for o in others if o is not None])
+        diffs = vlttng.abi.diff(old, new)
+        vlttng.abi.save(self._venv_path, name, new)
+        self._abi_changed[name] = bool(diffs)
+
+        if diffs and self._verbose:
+            _pinfo('Interface of {} changed: {}'.format(name, '; '.join(diffs)))
+
+    def _run_task(self, name, jobs):
+        from vlttng.venv import _pinfo, _pwarn
+
+        if name not in self._changed:
+            changed_deps = [dep for dep in self._projects[name]['deps']
+                            if self._abi_changed.get(dep)]
+            self._events.cache_lookup('abi', name, not changed_deps)
+
+            if not changed_deps:
+                _pinfo('{} is up to date (no dependency interface change)'.format(name))
+
+                self._abi_changed[name] = False
+                return True
+
+        env = dict(os.environ)
+        env['VLTTNG_NO_FETCH'] = '1'
+
+        if jobs is not None:
+            env['VLTTNG_JOBS'] = str(jobs)
+
+        what = 'Update' if name in self._changed else 'Rebuild'
+        steps = self._task_steps(name)
+
+        _pinfo('{} {} (make jobs: {})'.format(what, name,
+                                              jobs if jobs is not None else 'unlimited'))
+        begin_ns = time.time_ns()
+
+        for step in steps:
+            with self._events.step(name, step, jobs) as ev_step:
+                ok, log = self._run_script(name, step, env)
+                ev_step.ok = ok
+
+            if not ok:
+                from vlttng.venv import _ptail
+
+                _pwarn('Cannot {} {} (log: "{}")'.format(what.lower(), name,
+                                                         log.path))
+                _ptail(log)
+                return False
+
+        self._update_abi(name, begin_ns)
+        return True
+
+    def update(self):
+        from vlttng.venv import _pinfo, _pwarn
+        import vlttng.venv
+
+        git_names = self._git_names()
+
+        if not git_names:
+            _pinfo('No project with a Git source: nothing to update')
+            return True
+
+        if not self._fetch_all(git_names):
+            return False
+
+        self._versions = {}
+        self._changed = set(name for name in git_names if self._has_changed(name))
+        self._abi_changed = {}
+
+        if not self._changed:
+            _pinfo('All projects are up to date')
+            return True
+
+        names = self._dependents(self._changed)
+
+        for name in names:
+            version = self._versions.get(name)
+
+            if version is None and self._projects[name]['gitref'] is not None:
+                version = _git(self._src_path(name), 'rev-parse', 'HEAD').stdout.strip()
+
+            self._history.set_project(name, version,
+                                      self._projects[name].get('configure'))
+
+        deps = {name: self._projects[name]['deps'] for name in names}
+        order, path, path_estimate = self._critical_order(deps)
+
+        if path_estimate > 0:
+            _pinfo('Predicted duration: {} (critical path: {})'.format(fmt_duration(path_estimate),
+                                                                        ' -> '.join(path)))
+
+        results = vlttng.sched.Scheduler(deps, order, self._run_task,
+                                         self._jobs).run()
+        skipped = [name for name in self._order
+                   if results.get(name) == vlttng.sched.SKIPPED]
+
+        if skipped:
+            _pwarn('Skipped {} (failed dependency)'.format(', '.join(skipped)))
+
+        # refresh the activation files (new Python packages, for example)
+        if vlttng.sched.SUCCEEDED in results.values():
+            vlttng.venv._refresh_activation(self._venv_path)
+
+        vlttng.venv._pregressions(self._history)
+
+        return all(r == vlttng.sched.SUCCEEDED for r in results.values())
+
+    def run(self):
+        import vlttng.progress
+        import vlttng.history
+        import vlttng.venv
+
+        self._history = vlttng.history.History(self._venv_path,
+                                                command='update',
+                                                enabled=self._history_enabled)
+        self._events.add_listener(self._history)
+
+        # no live view when echoing the output of the commands
+        live = False if self._verbose else None
+        self._events.add_listener(vlttng.progress.ProgressView(self._history,
+                                                               live=live))
+        vlttng.venv._set_message_func(self._events.message)
+
+        if self._metrics_file is not None:
+            import vlttng.metrics
+
+            writer = vlttng.metrics.MetricsWriter(os.path.abspath(self._metrics_file),
+                                                  self._venv_path,
+                                                  vlttng.metrics.load_profile_hash(self._venv_path),
+                                                  'update')
+            self._events.add_listener(writer)
+
+        tracer = None
+
+        if self._self_trace:
+            import vlttng.selftrace
+
+            tracer = vlttng.selftrace.SelfTracer(self._venv_path, 'update')
+            self._events.add_listener(tracer)
+
+        ok = False
+
+        try:
+            ok = self.update()
+            return ok
+        finally:
+            self._events.run_end(ok)
+            self._events.close()
+            vlttng.venv._set_message_func(None)
+
+            if tracer is not None:
+                vlttng.venv._pinfo('Self-trace: "{}"'.format(tracer.path))
+
+
+def update(venv_path, jobs, verbose, compress_logs=False, metrics_file=None,
+           self_trace=False, history=True):
+    return _Updater(venv_path, jobs, verbose, compress_logs, metrics_file,
+                    self_trace, history).run()
@@ -46,26 +46,85 @@ update_template = '''#!/usr/bin/env bash
 
 # Run this file from your shell to update the {name} project
 # within this virtual environment.
+#
+# This script only rebuilds what changed since the last installation:
+#
+# * If `origin/{gitref}` is still the installed revision, it does
+#   nothing.
+#
+# * If any build system input changed, it uninstalls the project,
+#   cleans the source tree, and configures, builds, and installs it
+#   again.
+#
+# * Otherwise, it keeps the build tree and relies on the dependency
+#   tracking of the build system.
+#
+# Set `VLTTNG_FULL_UPDATE` to `1` to always do a full update.
 
 # Make sure we're in the right current working directory
 cd {src_path} || exit 1
 
-# Uninstall {name}
-{uninstall_lines}
+# Installed revision
+rev_path={rev_path}
 
-# Update the code
-git clean -xdf
-git fetch origin
+if [[ -r $rev_path ]]; then
+    old_rev=$(< "$rev_path")
+else
+    # first update since the creation of the virtual environment
+    old_rev=$(git rev-parse HEAD) || exit 1
+    mkdir -p "$(dirname "$rev_path")" && echo "$old_rev" > "$rev_path"
+fi
+
+# Fetch the code (`vlttng update` already did)
+if [[ $VLTTNG_NO_FETCH != 1 ]]; then
+    git fetch origin || exit 1
+fi
+
+if ! new_rev=$(git rev-parse --verify --quiet 'origin/{gitref}^{{commit}}'); then
+    echo 'Error: Cannot find origin/{gitref}' >&2
+    exit 1
+fi
+
+full=$VLTTNG_FULL_UPDATE
+
+if [[ $full != 1 && $old_rev == "$new_rev" ]]; then
+    echo '{name} is up to date ({gitref}: '"${{new_rev:0:12}}"')'
+    exit 0
+fi
+
+if [[ $full != 1 ]]; then
+    if [[ -n {configured_file} && ! -f {configured_file} ]]; then
+        # not configured
+        full=1
+    elif ! git cat-file -e "$old_rev^{{commit}}" 2>/dev/null; then
+        # unknown installed revision
+        full=1
+    elif git diff --name-only "$old_rev" "$new_rev" | grep -qE '{build_inputs_re}'; then
+        # build system input changed
+        full=1
+    fi
+fi
 
-if ! git checkout origin/{gitref}; then
+if [[ $full == 1 ]]; then
+    # Uninstall {name}
+    {uninstall_lines}
+
+    git clean -xdf
+fi
+
+# Update the code
+if ! git -c advice.detachedHead=false checkout "$new_rev"; then
     echo 'Error: Cannot checkout origin/{gitref}' >&2
     exit 1
 fi
 
-# Configure {name}
-../../conf-{name}.bash
+if [[ $full == 1 ]]; then
+    # Configure {name}
+    ../../conf-{name}.bash || exit 1
+fi
 
-# Build {name}
-../../build-{name}.bash
-../../install-{name}.bash
+# Build and install {name}
+../../build-{name}.bash || exit 1
+../../install-{name}.bash || exit 1
+echo "$new_rev" > "$rev_path"
 '''
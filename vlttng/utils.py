@@ -21,12 +21,39 @@
 # THE SOFTWARE.
 
 import sys
-from termcolor import colored
 
 
 def perror(msg, exit_status=1):
+    from termcolor import colored
+
     msg = 'Error: {}'.format(msg)
     print(colored(msg, 'red', attrs=['bold']), file=sys.stderr)
 
     if exit_status is not None:
         sys.exit(exit_status)
+
+
+def fmt_duration(seconds):
+    seconds = int(seconds)
+
+    if seconds >= 3600:
+        return '{}:{:02}:{:02}'.format(seconds // 3600, seconds // 60 % 60,
+                                       seconds % 60)
+
+    return '{}:{:02}'.format(seconds // 60, seconds % 60)
+
+
+# total size of the regular files under `path` (0 if it doesn't exist)
+def tree_size(path):
+    import os
+
+    size = 0
+
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+
+    return size
@@ -24,14 +24,16 @@ import re
 import os
 import sys
 import stat
+import time
 import copy
 import shlex
 import os.path
+import contextlib
 import functools
 import subprocess
 import vlttng.profile
 from termcolor import colored
-from vlttng.utils import perror
+from vlttng.utils import perror, fmt_duration, tree_size
 from pathlib import PurePosixPath
 
 
@@ -48,6 +50,60 @@ def _psetenv(key, val):
     print(colored(setenv, 'grey', attrs=['bold']))
 
 
+# build order of the known projects: each project comes after its
+# dependencies (`_PROJECT_DEPS`)
+_BUILD_ORDER = (
+    'urcu',
+    'popt',
+    'lttng-ust',
+    'libxml2',
+    'glib',
+    'elfutils',
+    'babeltrace',
+    'babeltrace2',
+    'lttng-tools',
+    'lttng-modules',
+    'lttng-analyses',
+    'tracecompass',
+    'lttng-scope',
+)
+
+
+# project name to the names of the projects it depends on (when they're
+# part of the same virtual environment)
+_PROJECT_DEPS = {
+    'lttng-ust': ['urcu'],
+    'lttng-tools': ['urcu', 'popt', 'lttng-ust', 'libxml2'],
+    'babeltrace': ['popt', 'glib', 'elfutils'],
+    'babeltrace2': ['glib', 'elfutils'],
+    'lttng-analyses': ['babeltrace'],
+}
+
+
+# projects which `--pgo` builds twice: instrumented, then, after a
+# training run (decoding a generated CTF trace), with the profile data
+_PGO_PROJECTS = ('babeltrace', 'babeltrace2')
+
+# minimum GCC major version for `--pgo` (`-fprofile-prefix-path`)
+_PGO_MIN_GCC_VERSION = 11
+
+# number of events of the training trace of `--pgo`
+_PGO_TRAINING_EVENT_COUNT = 200000
+
+# compiler flags of `--pgo` when neither the profile nor the environment
+# sets `CFLAGS` or `CXXFLAGS` (default ones of autoconf)
+_PGO_DEFAULT_FLAGS = '-g -O2'
+
+
+# a change to one of those files, between two revisions of a project,
+# requires a full update (see `update_template.py`)
+_BUILD_INPUTS_RE = r'(^|/)(configure\.(ac|in)|Makefile\.am|[^/]+\.m4|bootstrap(\.sh)?|autogen(\.sh)?|meson\.build|meson_options\.txt|meson\.options)$'
+
+# build directory of the Meson projects, within their source tree (the
+# GNOME convention: some source trees have a `build` directory)
+_MESON_BUILD_DIR = '_build'
+
+
 _first_info_done = False
 
 
@@ -55,19 +111,190 @@ def _comment(msg):
     return '# {}'.format(msg)
 
 
+# when not `None`, function which prints the messages of `_pinfo()` and
+# `_pwarn()` instead of `print()` (progress view)
+_message_func = None
+
+
+def _set_message_func(func):
+    global _message_func
+
+    _message_func = func
+
+
 def _pinfo(msg):
     global _first_info_done
 
+    msg = colored(_comment(msg), 'blue', attrs=['bold'])
+
+    if _message_func is not None:
+        _message_func(msg)
+        return
+
     if _first_info_done:
         print()
     else:
         _first_info_done = True
 
-    print(colored(_comment(msg), 'blue', attrs=['bold']))
+    print(msg)
 
 
 def _pwarn(msg):
-    print(colored(_comment('Warning: {}'.format(msg)), 'yellow', attrs=['bold']))
+    msg = colored(_comment('Warning: {}'.format(msg)), 'yellow', attrs=['bold'])
+
+    if _message_func is not None:
+        _message_func(msg)
+        return
+
+    print(msg)
+
+
+def _ptail(log, print_func=None):
+    tail = log.tail
+
+    if not tail:
+        return
+
+    print_func = print_func or _message_func or print
+    print_func(colored(_comment('Last {} lines of "{}":'.format(len(tail), log.path)),
+                       'red', attrs=['bold']))
+    print_func('\n'.join(tail))
+
+
+def _pregressions(history):
+    for regression in history.regressions:
+        step = regression.step
+        _pwarn('{} {} took {}: {:.1f} times its usual duration ({})'.format(step.project,
+                                                                          step.phase,
+                                                                          fmt_duration(step.duration),
+                                                                          regression.factor,
+                                                                          fmt_duration(regression.estimate)))
+
+
+# True if the source tree `src_path` only has a Meson build system
+def _is_meson_project(src_path):
+    if not os.path.isfile(os.path.join(src_path, 'meson.build')):
+        return False
+
+    for f in ('configure', 'configure.ac', 'configure.in'):
+        if os.path.isfile(os.path.join(src_path, f)):
+            return False
+
+    return True
+
+
+# options of the Meson project `src_path` as a dictionary of name to
+# `(type, choices)`, or `None` if Meson cannot introspect it
+def _get_meson_options(src_path):
+    import json
+
+    try:
+        out = subprocess.check_output(['meson', 'introspect', '--buildoptions',
+                                       'meson.build'],
+                                      cwd=src_path, stdin=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL,
+                                      universal_newlines=True)
+        return {opt['name']: (opt['type'], opt.get('choices') or [])
+                for opt in json.loads(out)}
+    except (OSError, ValueError, KeyError, subprocess.CalledProcessError):
+        return
+
+
+# Meson option value of the configure option value `value` (`True` for
+# `--enable-X`/`--with-X`, `False` for `--disable-X`/`--without-X`) for
+# the option type `opt_type` with the choices `choices`
+def _meson_option_value(value, opt_type, choices):
+    if value in ('yes', 'no'):
+        value = value == 'yes'
+
+    if type(value) is bool:
+        if opt_type == 'combo' and 'enabled' in choices:
+            # feature option
+            return 'enabled' if value else 'disabled'
+
+        return 'true' if value else 'false'
+
+    return value
+
+
+# Converts the configure options `conf_args` of the Meson project
+# `src_path` to `meson setup` options.
+#
+# `--enable-X[=V]`, `--disable-X`, `--with-X[=V]`, and `--without-X`
+# become `-DX=V` with a value which depends on the type of the Meson
+# option `X` (`true`/`false` or `enabled`/`disabled`); `-D` and the
+# other options are kept as is. Returns the Meson options and the
+# ignored configure options (unknown to the project).
+def _meson_args_from_conf_args(src_path, conf_args):
+    known_opts = _get_meson_options(src_path)
+    meson_args = []
+    ignored = []
+
+    for arg in shlex.split(conf_args):
+        m = re.match(r'^--(enable|disable|with|without)-([^=]+)(?:=(.*))?$', arg)
+
+        if not m:
+            meson_args.append(arg)
+            continue
+
+        kind, name, value = m.groups()
+
+        if value is None:
+            value = kind in ('enable', 'with')
+        elif kind in ('disable', 'without'):
+            value = False
+
+        if name in ('shared', 'static') and type(value) is bool:
+            # `--disable-static` -> `-Ddefault_library=shared`
+            if value:
+                continue
+
+            meson_args.append('-Ddefault_library={}'.format('static' if name == 'shared' else 'shared'))
+            continue
+
+        opt_type = 'boolean'
+        choices = []
+
+        if known_opts is not None:
+            for opt_name in (name, name.replace('-', '_')):
+                if opt_name in known_opts:
+                    name = opt_name
+                    opt_type, choices = known_opts[opt_name]
+                    break
+            else:
+                ignored.append(arg)
+                continue
+
+        meson_args.append('-D{}={}'.format(name, _meson_option_value(value, opt_type,
+                                                                       choices)))
+
+    return meson_args, ignored
+
+
+def _get_python_site_packages(paths):
+    if not os.path.isdir(paths.lib):
+        return []
+
+    python_roots = []
+
+    for filename in sorted(os.listdir(paths.lib)):
+        if filename.startswith('python'):
+            python_root = os.path.join(paths.lib, filename)
+
+            if os.path.isdir(python_root):
+                python_roots.append(python_root)
+
+    site_packages = []
+
+    for python_root in python_roots:
+        for filename in sorted(os.listdir(python_root)):
+            if filename.endswith('-packages'):
+                site_package = os.path.join(python_root, filename)
+
+                if os.path.isdir(site_package):
+                    site_packages.append(site_package)
+
+    return site_packages
 
 
 def _patch_env(env, paths):
@@ -99,26 +326,7 @@ def _patch_env(env, paths):
 
     # PYTHONPATH
     if os.path.isdir(paths.lib):
-        python_roots = []
-
-        for filename in os.listdir(paths.lib):
-            if filename.startswith('python'):
-                python_root = os.path.join(paths.lib, filename)
-
-                if os.path.isdir(python_root):
-                    python_roots.append(python_root)
-
-        site_packages = []
-
-        for python_root in python_roots:
-            for filename in os.listdir(python_root):
-                if filename.endswith('-packages'):
-                    site_package = os.path.join(python_root, filename)
-
-                    if os.path.isdir(site_package):
-                        site_packages.append(site_package)
-
-        new_pythonpath = ':'.join(site_packages)
+        new_pythonpath = ':'.join(_get_python_site_packages(paths))
         pythonpath = env.get('PYTHONPATH', '')
         pythonpath = '{}:{}'.format(new_pythonpath, pythonpath)
         env['PYTHONPATH'] = pythonpath
@@ -138,26 +346,86 @@ def _get_full_env(env, paths):
 
 
 class _Runner:
-    def __init__(self, verbose, hide_export, paths):
+    def __init__(self, verbose, hide_export, paths, compress_logs=False,
+                 quiet=False, events=None):
         self._verbose = verbose
         self._hide_export = hide_export
+        self._quiet = quiet
         self._cwd = None
         self._env = None
         self._paths = paths
+        self._compress_logs = compress_logs
+        self._log_name = None
+        self._log = None
+        self._opened_log_names = set()
+        self._events = events
 
     @property
     def cwd(self):
         return self._cwd
 
+    # Sends the output of the next commands to the log file of the
+    # phase `phase` of the project `project` (`None` to not log).
+    def set_log(self, project, phase=None):
+        self.close_log()
+        self._log_name = None if project is None else (project, phase)
+
+    def close_log(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _get_log(self):
+        if self._log is None and self._log_name is not None:
+            import vlttng.log
+
+            path = vlttng.log.log_path(self._paths.venv, *self._log_name,
+                                       compress=self._compress_logs)
+            echo_prefix = '' if self._verbose and not self._quiet else None
+            append = self._log_name in self._opened_log_names
+            self._log = vlttng.log.Log(path, self._compress_logs, echo_prefix,
+                                       append)
+            self._opened_log_names.add(self._log_name)
+
+        return self._log
+
+    @property
+    def _log_project(self):
+        return None if self._log_name is None else self._log_name[0]
+
     def _run_line(self, cmd):
-        _pcmd(cmd)
-        stdio = None if self._verbose else subprocess.DEVNULL
-        popen = subprocess.Popen(cmd, stdin=None, stdout=stdio, stderr=stdio,
-                                 shell=True, cwd=self._cwd, env=self._env)
+        if not self._quiet:
+            _pcmd(cmd)
+
+        if self._events is not None:
+            project, phase = self._log_name or (None, None)
+            self._events.command(project, phase, cmd)
+
+        log = self._get_log()
+
+        if log is None:
+            stdio = None if self._verbose else subprocess.DEVNULL
+            popen = subprocess.Popen(cmd, stdin=None, stdout=stdio, stderr=stdio,
+                                     shell=True, cwd=self._cwd, env=self._env)
+        else:
+            log.write_cmd(cmd)
+            popen = subprocess.Popen(cmd, stdin=None, stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT, shell=True,
+                                     cwd=self._cwd, env=self._env)
+
+            with popen.stdout:
+                log.write_from_fd(popen.stdout.fileno())
+
         popen.wait()
 
         if popen.returncode != 0:
-            perror('Command exited with status {}'.format(popen.returncode))
+            if log is None:
+                perror('Command exited with status {}'.format(popen.returncode))
+
+            self.close_log()
+            _ptail(log)
+            perror('Command exited with status {} (log: "{}")'.format(popen.returncode,
+                                                                      log.path))
 
     def run(self, cmd):
         if type(cmd) is str:
@@ -167,14 +435,16 @@ class _Runner:
                 self._run_line(line)
 
     def cd(self, cwd):
-        msg = 'cd {}'.format(_sq(cwd))
-        print(colored(msg, 'cyan', attrs=['bold']))
+        if not self._quiet:
+            msg = 'cd {}'.format(_sq(cwd))
+            print(colored(msg, 'cyan', attrs=['bold']))
+
         self._cwd = cwd
 
     def set_env(self, env):
         self._env = _get_full_env(env, self._paths)
 
-        if not self._hide_export:
+        if not self._hide_export and not self._quiet:
             for key in sorted(self._env):
                 _psetenv(key, self._env[key])
 
@@ -182,10 +452,18 @@ class _Runner:
         cmd = 'wget {} -O {}'.format(_sq(url), _sq(output_path))
         self.run(cmd)
 
+        if self._events is not None:
+            path = os.path.join(self._cwd or '', output_path)
+            self._events.download(self._log_project, os.path.getsize(path))
+
     def git_clone(self, clone_url, path):
         cmd = 'git clone {} {}'.format(_sq(clone_url), _sq(path))
         self.run(cmd)
 
+        if self._events is not None:
+            git_dir = os.path.join(self._cwd or '', path, '.git')
+            self._events.download(self._log_project, tree_size(git_dir))
+
     def git_checkout(self, treeish):
         cmd = 'git checkout {}'.format(_sq(treeish))
         self.run(cmd)
@@ -301,6 +579,146 @@ class _Paths:
         return os.path.join(self.src, name)
 
 
+# Operations of the activation environment of the virtual environment
+# at `paths` (see `venv_env.py`): mirrors what sourcing `activate` does
+# (see `activate_template.py`).
+def _activation_ops(paths, virt_env, classpath, site_packages, has_modules):
+    ops = [
+        ['set', 'VLTTNG', paths.venv],
+        ['prepend', 'PATH', paths.bin, ':'],
+        ['prepend', 'LD_LIBRARY_PATH', paths.lib, ':'],
+        ['prepend', 'CPPFLAGS', '-I{}'.format(paths.include), ' '],
+        ['prepend', 'LDFLAGS', '-L{}'.format(paths.lib), ' '],
+        ['prepend-default', 'MANPATH', os.path.join(paths.share, 'man'), ':'],
+        ['prepend', 'PKG_CONFIG_PATH', paths.pkgconfig, ':'],
+    ]
+
+    if classpath is not None:
+        ops.append(['set', 'VLTTNG_CLASSPATH', classpath])
+
+    if site_packages:
+        ops.append(['prepend', 'PYTHONPATH', ':'.join(site_packages), ':'])
+
+    ops.append(['set', 'LTTNG_HOME', paths.home])
+
+    if has_modules:
+        ops.append(['set', 'MODPROBE_OPTIONS',
+                    "-d '{}'".format(paths.usr)])
+
+    for key, val in virt_env.items():
+        ops.append(['set', key.strip(), str(val)])
+
+    return ops
+
+
+# Creates the `activate` script, the activation environment (see
+# `venv_env.py`), and the `vlttng-run` shim of the virtual environment
+# at `paths`.
+#
+# `virt_env` is the virtual environment of the profile and `classpath`
+# the Java class path of the LTTng-UST agent, if any.
+#
+# Everything which depends on the installed files is resolved now (this
+# runs again after each project installation and after `vlttng update`)
+# so that sourcing the script doesn't fork any process.
+def _create_activation(paths, virt_env, classpath=None, has_modules=False,
+                       has_lttng_scope=False):
+    from vlttng.activate_template import activate_template
+    from vlttng.run_template import run_template
+    import vlttng.venv_env
+
+    env_items = []
+    unenv_items = []
+    env = dict(virt_env)
+
+    # the activation template explicitly defines those environment
+    # variables, so they must not be overridden by the user or by us.
+    rm_keys = (
+        'VLTTNG',
+        'PATH',
+        'CPPFLAGS',
+        'LDFLAGS',
+        'LD_LIBRARY_PATH',
+        'MANPATH',
+        'PKG_CONFIG_PATH',
+        'PYTHONPATH',
+        'LTTNG_HOME',
+        'PS1',
+        'MODPROBE_OPTIONS',
+    )
+
+    for key in rm_keys:
+        if key in env:
+            del env[key]
+
+    for key, val in env.items():
+        key = key.strip()
+        env_items.append('vlttng-save-env {}'.format(key))
+        setenv = 'export {}={}'.format(key, _sq(str(val)))
+        env_items.append(setenv)
+        unenv_items.append('    vlttng-restore-env {}'.format(key))
+
+    env_lines = '\n'.join(env_items)
+    unenv_lines = '\n'.join(unenv_items)
+    classpath_lines = ['# (no LTTng-UST Java agent)']
+
+    if classpath is not None:
+        classpath_lines = [
+            'VLTTNG_CLASSPATH={}'.format(_sq(classpath)),
+            'export VLTTNG_CLASSPATH',
+        ]
+
+    pythonpath_lines = ['# (no Python site packages)']
+    site_packages = _get_python_site_packages(paths)
+
+    if site_packages:
+        pythonpath_lines = [
+            'PYTHONPATH={}"${{PYTHONPATH:+:$PYTHONPATH}}"'.format(_sq(':'.join(site_packages))),
+            'export PYTHONPATH',
+        ]
+
+    prompt_prefix = '[{}] '.format(os.path.basename(paths.venv))
+    activate = activate_template.format(venv_path=_sq(paths.venv),
+                                        has_modules='1' if has_modules else '0',
+                                        has_lttng_scope='1' if has_lttng_scope else '0',
+                                        classpath='\n'.join(classpath_lines),
+                                        pythonpath='\n'.join(pythonpath_lines),
+                                        prompt_prefix=_sq(prompt_prefix),
+                                        env=env_lines,
+                                        unenv=unenv_lines)
+    activate_path = os.path.join(paths.venv, 'activate')
+
+    if not os.path.exists(activate_path):
+        _pinfo('Create activation script "{}"'.format(activate_path))
+
+    with open(activate_path, 'w') as f:
+        f.write(activate)
+
+    # same environment for `vlttng exec` and `vlttng-run`
+    ops = _activation_ops(paths, env, classpath, site_packages, has_modules)
+    vlttng.venv_env.write(paths.venv, ops)
+
+    # `vlttng-run`: tiny POSIX shell shim which sets the environment
+    # and executes its arguments
+    run = run_template.format(exports='\n'.join(vlttng.venv_env.sh_lines(ops)))
+    run_path = os.path.join(paths.bin, 'vlttng-run')
+
+    with open(run_path, 'w') as f:
+        f.write(run)
+
+    st = os.stat(run_path)
+    os.chmod(run_path, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+# Creates the activation files of the virtual environment `venv_path`
+# again with the settings which `VEnvCreator` saved.
+def _refresh_activation(venv_path):
+    import vlttng.venv_env
+
+    _create_activation(_Paths(venv_path),
+                       **vlttng.venv_env.load_activation(venv_path))
+
+
 class _ProjectInstructions:
     def __init__(self, project, add_env=None, conf_lines=None,
                  build_lines=None, install_lines=None, uninstall_lines=None):
@@ -316,11 +734,83 @@ class _ProjectInstructions:
         return self._project
 
 
+# Options of `VEnvCreator` besides the profile:
+#
+# `compress_logs`: compress the log files with gzip.
+# `progress`: show the progress of each step instead of the commands.
+# `metrics_file`: path of the OpenMetrics text file to write, if any.
+# `self_trace`: record the build events as a CTF trace.
+# `history`: record the step durations in the build history.
+# `pgo`: build Babeltrace with profile-guided optimization.
+# `compiler`, `linker`: toolchain to select (see `toolchain.py`).
+# `maven_offline`: only use the cached Maven artifacts.
+class Options:
+    def __init__(self, compress_logs=False, progress=False, metrics_file=None,
+                 self_trace=False, history=True, pgo=False, compiler=None,
+                 linker=None, maven_offline=False):
+        self.compress_logs = compress_logs
+        self.progress = progress
+        self.metrics_file = metrics_file
+        self.self_trace = self_trace
+        self.history = history
+        self.pgo = pgo
+        self.compiler = compiler
+        self.linker = linker
+        self.maven_offline = maven_offline
+
+
 class VEnvCreator:
-    def __init__(self, path, profile, force, verbose, jobs, hide_export):
+    def __init__(self, path, profile, force, verbose, jobs, hide_export,
+                 options=None):
+        import vlttng.history
+        import vlttng.metrics
+        import vlttng.events
+
+        if options is None:
+            options = Options()
+
         self._paths = _Paths(os.path.abspath(path))
-        self._runner = _Runner(verbose, hide_export, self._paths)
+        self._events = vlttng.events.Hub()
+        self._runner = _Runner(verbose, hide_export, self._paths,
+                               options.compress_logs, quiet=options.progress,
+                               events=self._events)
+        self._history = vlttng.history.History(self._paths.venv,
+                                                enabled=options.history)
+        self._events.add_listener(self._history)
+        self._toolchain = None
+
+        if options.compiler is not None or options.linker is not None:
+            # before the profile hash: the toolchain is part of the
+            # build environments
+            self._toolchain = self._select_toolchain(profile,
+                                                     options.compiler,
+                                                     options.linker)
+
+        self._profile_hash = vlttng.metrics.profile_hash(profile)
+
+        if options.metrics_file is not None:
+            writer = vlttng.metrics.MetricsWriter(os.path.abspath(options.metrics_file),
+                                                  self._paths.venv,
+                                                  self._profile_hash, 'create')
+            self._events.add_listener(writer)
+
+        tracer = None
+
+        if options.self_trace:
+            import vlttng.selftrace
+
+            tracer = vlttng.selftrace.SelfTracer(self._paths.venv, 'create')
+            self._events.add_listener(tracer)
+
+        if options.progress:
+            import vlttng.progress
+
+            self._events.add_listener(vlttng.progress.ProgressView(self._history))
+            _set_message_func(self._events.message)
+
         self._jobs = jobs
+        self._pgo = options.pgo
+        self._maven_offline = options.maven_offline
         self._profile = profile
         self._force = force
         self._verbose = verbose
@@ -341,10 +831,137 @@ class VEnvCreator:
             'tracecompass': self._create_project_instructions_tracecompass,
             'urcu': self._create_project_instructions_generic_autotools,
         }
-        self._create()
+
+        ok = False
+
+        try:
+            self._create()
+            ok = True
+        finally:
+            self._events.run_end(ok)
+            self._runner.close_log()
+            self._events.close()
+            _set_message_func(None)
+
+            if tracer is not None:
+                _pinfo('Self-trace: "{}"'.format(tracer.path))
+
+    # context manager which runs a step (`phase` of `project`), logging
+    # the output of its commands to the step's log file
+    @contextlib.contextmanager
+    def _step(self, project, phase):
+        self._runner.set_log(project, phase)
+
+        try:
+            with self._events.step(project, phase, self._jobs):
+                yield
+        finally:
+            self._runner.set_log('vlttng', 'create')
+
+    # Selects the toolchain of the compiler `compiler` and of the linker
+    # `linker` (`auto` to detect the fastest one), falling back to the
+    # ones of the profile when they don't work, and applies it to the
+    # build environments of `profile`.
+    def _select_toolchain(self, profile, compiler, linker):
+        import vlttng.toolchain
+
+        env = _get_full_env(profile.build_env, self._paths)
+
+        if compiler == 'clang':
+            # Clang LTO objects are LLVM bitcode, which the GCC LTO
+            # tools (`lto-gcc` profile) can't handle
+            for build_env in [profile.build_env] + [p.build_env for p in profile.projects.values()]:
+                gcc_tools = ['{}={}'.format(key, build_env[key])
+                             for key in ('AR', 'NM', 'RANLIB')
+                             if str(build_env.get(key, '')).startswith('gcc-')]
+
+                if gcc_tools:
+                    perror('Cannot build with clang and the GCC LTO tools of the profile ({}): remove the `lto-gcc` profile'.format(', '.join(gcc_tools)))
+
+        if compiler is not None and not vlttng.toolchain.check(compiler, env):
+            _pwarn('Cannot build with {}: using the compiler of the profile'.format(compiler))
+            compiler = None
+
+        cc = compiler or env.get('CC') or 'cc'
+        selected_linker = None
+
+        if linker == 'auto':
+            candidates = vlttng.toolchain.AUTO_LINKERS
+        elif linker is not None:
+            candidates = (linker,)
+        else:
+            candidates = ()
+
+        for candidate in candidates:
+            if vlttng.toolchain.check(cc, env, candidate):
+                selected_linker = candidate
+                break
+
+            if linker != 'auto':
+                _pwarn('Cannot link with {} using `{}`: using the default linker'.format(candidate,
+                                                                                       cc))
+
+        if compiler is None and selected_linker is None:
+            if linker == 'auto':
+                _pinfo('No faster linker found: using the default linker')
+
+            return
+
+        toolchain = vlttng.toolchain.Toolchain(compiler, selected_linker)
+        _pinfo('Toolchain: {} compiler, {} linker'.format(compiler or 'profile',
+                                                          selected_linker or 'default'))
+        toolchain.apply(profile.build_env)
+
+        for project in profile.projects.values():
+            toolchain.apply(project.build_env)
+
+        return toolchain
+
+    # configure flags of `project` for the build history, which also
+    # depends on the toolchain
+    def _history_configure(self, project):
+        if self._toolchain is None:
+            return project.configure
+
+        return '{} [{}]'.format(project.configure, self._toolchain.key)
 
     def _get_make(self):
-        return 'make -j{} V=1'.format(self._jobs if self._jobs is not None else '')
+        # `vlttng update` sets `VLTTNG_JOBS` to share its job budget
+        jobs = self._jobs if self._jobs is not None else ''
+        return 'make -j${{VLTTNG_JOBS-{}}} V=1'.format(jobs)
+
+    def _get_mvn(self):
+        import vlttng.history
+
+        # The virtual environments share a local repository so that
+        # Maven only downloads an artifact once. Without a job count,
+        # one module build thread per CPU.
+        #
+        # Concurrent `vlttng` runs may write to this repository: make
+        # the resolver of Maven 3.9 or later lock the artifacts with
+        # files (older versions ignore those properties).
+        repo_path = os.path.join(vlttng.history.cache_dir(), 'maven')
+        jobs = self._jobs if self._jobs is not None else '1C'
+        mvn = 'mvn -T ${{VLTTNG_JOBS-{}}} -Dmaven.repo.local={}'.format(jobs,
+                                                                     _sq(repo_path))
+        mvn += ' -Daether.syncContext.named.factory=file-lock'
+        mvn += ' -Daether.syncContext.named.nameMapper=file-gav'
+
+        if self._maven_offline:
+            mvn += ' --offline'
+
+        return mvn
+
+    def _get_ninja(self, target=None):
+        # `-j0`: no limit, like `make -j`
+        jobs = self._jobs if self._jobs is not None else 0
+        ninja = 'ninja -C {} -j${{VLTTNG_JOBS-{}}} -v'.format(_MESON_BUILD_DIR,
+                                                             jobs)
+
+        if target is not None:
+            ninja += ' ' + target
+
+        return ninja
 
     def _check_man_pages(self, name, project):
         if type(project.source) is not vlttng.profile.GitSource:
@@ -456,8 +1073,23 @@ class VEnvCreator:
         return instructions
 
     def _create_project_instructions_lttng_modules(self, project):
+        make = self._get_make()
+
+        if self._toolchain is not None:
+            import vlttng.toolchain
+
+            kernel_compiler = vlttng.toolchain.kernel_compiler()
+
+            if self._toolchain.compiler not in (None, kernel_compiler):
+                _pwarn('LTTng-modules will be built with the compiler of the kernel')
+
+            kbuild_args = self._toolchain.kbuild_args(kernel_compiler)
+
+            if kbuild_args:
+                make += ' ' + ' '.join(kbuild_args)
+
         build_lines = [
-            self._get_make(),
+            make,
         ]
         sq_install_path = _sq(self._paths.usr)
         install_lines = [
@@ -481,13 +1113,14 @@ class VEnvCreator:
 
     def _create_project_instructions_tracecompass(self, project):
         dst = os.path.join(self._paths.opt, 'tracecompass')
+        build_lines = None
         install_lines = []
 
-        if type(project.source) is vlttng.profile.HttpFtpSource:
-            src = self._paths.project_src('tracecompass')
-        else:
-            install_lines = [
-                'mvn clean install -Dmaven.test.skip=true',
+        # `_fetch_source()` extracts a binary distribution to `dst`
+        # directly
+        if type(project.source) is vlttng.profile.GitSource:
+            build_lines = [
+                '{} clean install -Dmaven.test.skip=true'.format(self._get_mvn()),
             ]
             src = os.path.join('rcp',
                                'org.eclipse.tracecompass.rcp.product',
@@ -499,41 +1132,89 @@ class VEnvCreator:
                                'x86_64',
                                'trace-compass')
 
+            # copy the built product: the install script can run again
+            # without a build
+            install_lines = [
+                'rm -rf {}'.format(_sq(dst)),
+                'cp -r {} {}'.format(_sq(src), _sq(dst)),
+            ]
+
         link = os.path.join(self._paths.bin, 'tracecompass')
-        install_lines += [
-            'cp -rv {} {}'.format(_sq(src), _sq(dst)),
-            'ln -s {} {}'.format(_sq(os.path.join(dst, 'tracecompass')),
-                                 _sq(link)),
-        ]
+        install_lines.append('ln -sf {} {}'.format(_sq(os.path.join(dst, 'tracecompass')),
+                                                   _sq(link)))
 
-        return _ProjectInstructions(project, install_lines=install_lines)
+        return _ProjectInstructions(project, build_lines=build_lines,
+                                    install_lines=install_lines)
 
     def _create_project_instructions_lttng_scope(self, project):
         jar_dst = os.path.join(self._paths.opt, 'lttng-scope.jar')
+        build_lines = None
 
-        if type(project.source) is vlttng.profile.HttpFtpSource:
-            jar_src = os.path.join(self._paths.src, 'lttng-scope.jar')
-            install_lines = [
-                'cp -v {} {}'.format(_sq(jar_src), _sq(jar_dst)),
-            ]
-        else:
+        # `_fetch_source()` downloads a binary distribution to `jar_dst`
+        # directly
+        install_lines = None
+
+        if type(project.source) is vlttng.profile.GitSource:
             jar_dir = os.path.join('lttng-scope', 'target')
+            build_lines = [
+                '{} clean install -Dmaven.test.skip=true -DskipTests'.format(self._get_mvn()),
+            ]
             install_lines = [
-                'mvn clean install -Dmaven.test.skip=true -DskipTests',
                 'cp -v {}/*with-dependencies.jar {}'.format(_sq(jar_dir),
                                                              _sq(jar_dst)),
             ]
 
-        return _ProjectInstructions(project, install_lines=install_lines)
+        return _ProjectInstructions(project, build_lines=build_lines,
+                                    install_lines=install_lines)
+
+    def _create_project_instructions_generic_meson(self, project, add_conf_args=None):
+        project_src = self._paths.project_src(project.name)
+        conf_args = project.configure
+
+        if '--prefix' in project.configure:
+            fmt = 'Project "{}": I would not pass the --prefix configure option if I were you: it is handled by vlttng'
+            _pwarn(fmt.format(project.name))
+
+        if add_conf_args is not None:
+            conf_args += ' ' + add_conf_args
+
+        meson_args, ignored = _meson_args_from_conf_args(project_src,
+                                                         conf_args)
+
+        for arg in ignored:
+            _pwarn('Project "{}": ignoring the {} configure option: the Meson project has no such option'.format(project.name,
+                                                                                                                arg))
+
+        # same optimization level as the default `CFLAGS` of autotools
+        if not any(re.match(r'^(--buildtype|-Dbuildtype)\b', arg) for arg in meson_args):
+            meson_args.insert(0, '--buildtype=debugoptimized')
+
+        # `lib` instead of a multiarch directory: the activation
+        # environment only has `usr/lib`
+        conf_args = ['--prefix={}'.format(self._paths.usr), '--libdir=lib']
+        conf_args += meson_args
+        conf_line = 'meson setup {} {}'.format(' '.join(_sq(arg) for arg in conf_args),
+                                               _MESON_BUILD_DIR)
+
+        return _ProjectInstructions(project, conf_lines=[conf_line],
+                                    build_lines=[self._get_ninja()],
+                                    install_lines=[self._get_ninja('install')],
+                                    uninstall_lines=[self._get_ninja('uninstall')])
 
     def _create_project_instructions_generic_autotools(self, project, add_conf_args=None):
+        # migrated to Meson?
+        project_src = self._paths.project_src(project.name)
+
+        if _is_meson_project(project_src):
+            return self._create_project_instructions_generic_meson(project,
+                                                                   add_conf_args)
+
         conf_lines = []
         build_lines = [self._get_make()]
         install_lines = ['make install']
         uninstall_lines = ['make uninstall']
 
         # bootstrap?
-        project_src = self._paths.project_src(project.name)
 
         if not os.path.isfile(os.path.join(project_src, 'configure')):
             for f in ('bootstrap', 'bootstrap.sh', 'autogen', 'autogen.sh',):
@@ -570,6 +1251,7 @@ class VEnvCreator:
         self._validate_profile()
 
         _pinfo('Create LTTng virtual environment')
+        self._pprediction()
 
         # create virtual environment directory
         if os.path.exists(self._paths.venv):
@@ -580,6 +1262,7 @@ class VEnvCreator:
                 perror('Virtual environment path "{}" exists (use --force to overwrite)'.format(self._paths.venv))
 
         self._runner.mkdir_p(self._paths.venv)
+        self._runner.set_log('vlttng', 'create')
         self._runner.mkdir_p(self._paths.home)
         self._runner.mkdir_p(self._paths.bin)
         self._runner.mkdir_p(self._paths.lib)
@@ -600,121 +1283,163 @@ class VEnvCreator:
         # enter the environment and investigate.
         self._create_activate()
 
+        # project manifest for `vlttng update`
+        self._create_manifest()
+
         # build projects in this order
-        self._build_project('urcu')
-        self._build_project('popt')
-        self._build_lttng_ust()
-        self._build_project('libxml2')
-        self._build_project('babeltrace')
-        self._build_project('babeltrace2')
-        self._build_project('lttng-tools')
-        self._build_project('lttng-modules')
-        self._build_project('glib')
-        self._build_project('elfutils')
-        self._build_project('lttng-analyses')
-        self._build_project('tracecompass')
-        self._build_project('lttng-scope')
+        for name in _BUILD_ORDER:
+            if name == 'lttng-ust':
+                self._build_lttng_ust()
+            else:
+                self._build_project(name)
+
+        _pregressions(self._history)
+
+    def _create_manifest(self):
+        import vlttng.metrics
+        import vlttng.update
+
+        projects = []
+
+        for name in _BUILD_ORDER:
+            project = self._profile.projects.get(name)
+
+            if project is None:
+                continue
+
+            gitref = None
+
+            if type(project.source) is vlttng.profile.GitSource:
+                gitref = project.source.checkout
+
+            deps = [dep for dep in _PROJECT_DEPS.get(name, [])
+                    if dep in self._profile.projects]
+            projects.append((name, deps, gitref,
+                             self._history_configure(project)))
+
+        vlttng.update.write_manifest(self._paths.venv, projects)
+
+        # for the labels of the metrics of `vlttng update`
+        vlttng.metrics.save_profile_hash(self._paths.venv, self._profile_hash)
 
     def _create_activate(self):
-        from vlttng.activate_template import activate_template
-
-        env_items = []
-        unenv_items = []
-        env = copy.deepcopy(self._profile.virt_env)
-        _patch_env(env, self._paths)
-
-        # the activation template explicitly defines those environment
-        # variables, so they must not be overridden by the user or by us.
-        rm_keys = (
-            'VLTTNG',
-            'PATH',
-            'CPPFLAGS',
-            'LDFLAGS',
-            'LD_LIBRARY_PATH',
-            'MANPATH',
-            'PKG_CONFIG_PATH',
-            'PYTHONPATH',
-            'LTTNG_HOME',
-            'PS1',
-            'MODPROBE_OPTIONS',
-        )
+        import vlttng.venv_env
 
-        for key in rm_keys:
-            if key in env:
-                del env[key]
-
-        for key, val in env.items():
-            key = key.strip()
-            env_items.append('vlttng-save-env {}'.format(key))
-            setenv = 'export {}={}'.format(key, _sq(str(val)))
-            env_items.append(setenv)
-            unenv_items.append('    vlttng-restore-env {}'.format(key))
-
-        env_lines = '\n'.join(env_items)
-        unenv_lines = '\n'.join(unenv_items)
-        lttng_modules_src_path = self._src_paths.get('lttng-modules', '')
-        has_modules = '1' if 'lttng-modules' in self._profile.projects else '0'
-        has_lttng_scope = '1' if 'lttng-scope' in self._profile.projects else '0'
-        has_java = '0'
-
-        if 'lttng-ust' in self._profile.projects:
-            configure = self._profile.projects['lttng-ust'].configure
-
-            if '--enable-java-agent' in configure:
-                has_java = '1'
-
-        activate = activate_template.format(venv_path=_sq(self._paths.venv),
-                                            has_modules=has_modules,
-                                            has_java=has_java,
-                                            has_lttng_scope=has_lttng_scope,
-                                            env=env_lines,
-                                            unenv=unenv_lines)
-        activate_path = os.path.join(self._paths.venv, 'activate')
-        _pinfo('Create activation script "{}"'.format(activate_path))
+        activation = {
+            'virt_env': self._profile.virt_env,
+            'classpath': self._get_java_classpath(),
+            'has_modules': 'lttng-modules' in self._profile.projects,
+            'has_lttng_scope': 'lttng-scope' in self._profile.projects,
+        }
 
-        with open(activate_path, 'w') as f:
-            f.write(activate)
+        # `vlttng update` creates the activation files again with those
+        vlttng.venv_env.write_activation(self._paths.venv, activation)
+        _create_activation(self._paths, **activation)
+
+    def _get_java_classpath(self):
+        if 'lttng-ust' not in self._profile.projects:
+            return
+
+        if '--enable-java-agent' not in self._profile.projects['lttng-ust'].configure:
+            return
+
+        jars = [os.path.join(self._paths.share_java, 'liblttng-ust-agent.jar'),
+                self._paths.log4j1_jar] + self._paths.log4j2_jars
+        return ':'.join(jars)
 
     def _fetch_sources(self):
         self._runner.mkdir_p(self._paths.src)
         self._runner.cd(self._paths.src)
 
         for project in self._profile.projects.values():
-            source = project.source
-            src_path = None
+            with self._step(project.name, 'fetch'):
+                self._fetch_source(project)
+
+            self._history.set_project(project.name,
+                                      self._get_project_version(project),
+                                      self._history_configure(project))
+
+    def _get_project_version(self, project):
+        if type(project.source) is vlttng.profile.GitSource:
+            try:
+                return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                               cwd=self._paths.project_src(project.name),
+                                               stdin=subprocess.DEVNULL,
+                                               stderr=subprocess.DEVNULL,
+                                               universal_newlines=True).strip()
+            except (OSError, subprocess.CalledProcessError):
+                return
+
+        return PurePosixPath(project.source.url).name
 
-            if type(source) is vlttng.profile.HttpFtpSource:
-                # download
-                posix_path = PurePosixPath(source.url)
+    def _pprediction(self):
+        total = 0
+        unknown = 0
+
+        for name, project in self._profile.projects.items():
+            self._history.set_project(name,
+                                      configure=self._history_configure(project))
 
-                if project.name == 'lttng-scope':
-                    src_path = self._paths.src
-                    filename = 'lttng-scope.jar'
+            for phase in ('fetch', 'conf', 'build', 'install'):
+                estimate = self._history.estimate(name, phase, self._jobs)
+
+                if estimate is None:
+                    unknown += 1
                 else:
-                    src_path = project.name
-                    filename = posix_path.name
+                    total += estimate
+
+        if total == 0:
+            return
+
+        msg = 'Predicted duration: {}'.format(fmt_duration(total))
+
+        if unknown:
+            msg += ' (without {} unknown steps)'.format(unknown)
 
-                self._runner.wget(source.url, filename)
+        _pinfo(msg)
 
-                # extract
-                if not filename.endswith('.jar'):
-                    self._runner.mkdir_p(self._paths.project_src(project.name))
-                    self._runner.tar_x(filename, project.name)
-            elif type(source) is vlttng.profile.GitSource:
+    def _fetch_source(self, project):
+        source = project.source
+        src_path = None
+
+        if type(source) is vlttng.profile.HttpFtpSource:
+            # download
+            posix_path = PurePosixPath(source.url)
+
+            if project.name == 'lttng-scope':
+                # binary distribution: download it where it's installed
+                src_path = self._paths.src
+                filename = os.path.join(self._paths.opt, 'lttng-scope.jar')
+            elif project.name == 'tracecompass':
+                # binary distribution: extract it where it's installed
+                src_path = os.path.join(self._paths.opt, 'tracecompass')
+                filename = posix_path.name
+            else:
                 src_path = project.name
+                filename = posix_path.name
 
-                # clone
-                self._runner.git_clone(source.clone_url, project.name)
+            self._runner.wget(source.url, filename)
 
-                # checkout
-                self._runner.cd(self._paths.project_src(project.name))
-                self._runner.git_checkout(source.checkout)
-                self._runner.cd(self._paths.src)
+            # extract
+            if not filename.endswith('.jar'):
+                extract_path = self._paths.project_src(src_path)
+                self._runner.mkdir_p(extract_path)
+                self._runner.tar_x(filename, extract_path)
+        elif type(source) is vlttng.profile.GitSource:
+            src_path = project.name
+
+            # clone
+            self._runner.git_clone(source.clone_url, project.name)
+
+            # checkout
+            self._runner.cd(self._paths.project_src(project.name))
+            self._runner.git_checkout(source.checkout)
+            self._runner.cd(self._paths.src)
 
-            # keep where the source of this project is
-            if src_path is not None:
-                src_path = self._paths.project_src(src_path)
-                self._src_paths[project.name] = src_path
+        # keep where the source of this project is
+        if src_path is not None:
+            src_path = self._paths.project_src(src_path)
+            self._src_paths[project.name] = src_path
 
     def _build_lttng_ust(self):
         project = self._profile.projects.get('lttng-ust')
@@ -722,6 +1447,12 @@ class VEnvCreator:
         if project is None:
             return
 
+        with self._step('lttng-ust', 'fetch-java-deps'):
+            self._fetch_lttng_ust_java_deps(project)
+
+        self._build_project('lttng-ust')
+
+    def _fetch_lttng_ust_java_deps(self, project):
         if '--enable-java-agent-all' in project.configure or re.search(r'--enable-java-agent-log4j\b', project.configure):
             # get Reload4j
             reload4j_version='1.2.26'
@@ -756,8 +1487,6 @@ class VEnvCreator:
                 src_jar = os.path.basename(dest_jar).replace('.jar', '-{}.jar'.format(log4j2_version))
                 self._runner.cp_rv(os.path.join(log4j2_name, src_jar), dest_jar)
 
-        self._build_project('lttng-ust')
-
     def _get_build_env_from_instructions(self, instructions):
         build_env = copy.deepcopy(self._profile.build_env)
         build_env.update(instructions.project.build_env)
@@ -773,24 +1502,188 @@ class VEnvCreator:
         if instructions is None:
             return
 
+        if self._pgo and name in _PGO_PROJECTS:
+            self._pgo_train(instructions)
+
         build_env = self._get_build_env_from_instructions(instructions)
         self._runner.set_env(build_env)
         self._runner.cd(self._src_paths[instructions.project.name])
 
         if instructions.conf_lines is not None:
             _pinfo('Configure {}'.format(name))
-            self._runner.run(instructions.conf_lines)
+
+            with self._step(name, 'conf'):
+                self._runner.run(instructions.conf_lines)
 
         if instructions.build_lines is not None:
             _pinfo('Build {}'.format(name))
-            self._runner.run(instructions.build_lines)
+
+            with self._step(name, 'build'):
+                self._runner.run(instructions.build_lines)
 
         if instructions.install_lines is not None:
             _pinfo('Install {}'.format(name))
-            self._runner.run(instructions.install_lines)
+
+            with self._step(name, 'install'):
+                install_begin_ns = time.time_ns()
+                self._runner.run(instructions.install_lines)
+                self._record_abi(name, install_begin_ns)
 
         self._create_scripts(instructions)
 
+        # refresh the activation script (new Python packages, for example)
+        self._create_activate()
+
+    def _gcc_major_version(self, build_env):
+        env = _get_full_env(build_env, self._paths)
+
+        try:
+            # `CC` may be a command line (`ccache gcc`, for example)
+            out = subprocess.check_output('${CC:-cc} -dumpfullversion -dumpversion; ${CC:-cc} --version',
+                                          shell=True, env=env,
+                                          stdin=subprocess.DEVNULL,
+                                          stderr=subprocess.DEVNULL,
+                                          universal_newlines=True)
+        except (OSError, subprocess.CalledProcessError):
+            return
+
+        lines = out.splitlines()
+
+        if 'Free Software Foundation' not in out or not lines:
+            return
+
+        try:
+            return int(lines[0].split('.')[0])
+        except ValueError:
+            return
+
+    def _pgo_profile_dir(self, project, build_env, gcc_version):
+        import vlttng.history
+        import hashlib
+        import json
+
+        # profile data of a given source revision, configuration, and
+        # toolchain
+        key = json.dumps([self._get_project_version(project),
+                          project.configure, build_env.get('CFLAGS'),
+                          build_env.get('LDFLAGS'), gcc_version])
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return os.path.join(vlttng.history.cache_dir(), 'pgo', project.name,
+                            digest)
+
+    # Trains the project of `instructions` with an instrumented build,
+    # unless its profile data is already cached, and makes its build
+    # use the profile data.
+    def _pgo_train(self, instructions):
+        import tempfile
+
+        project = instructions.project
+        name = project.name
+        build_env = self._get_build_env_from_instructions(instructions)
+        gcc_version = self._gcc_major_version(build_env)
+
+        if gcc_version is None or gcc_version < _PGO_MIN_GCC_VERSION:
+            _pwarn('{} will not be built with PGO: it needs GCC {} or later'.format(name,
+                                                                                  _PGO_MIN_GCC_VERSION))
+            return
+
+        src_path = self._src_paths[name]
+        profile_dir = self._pgo_profile_dir(project, build_env, gcc_version)
+
+        def flags_env(flags):
+            env = {}
+
+            for key in ('CFLAGS', 'CXXFLAGS', 'LDFLAGS'):
+                base = build_env.get(key, os.environ.get(key))
+
+                # a set `CFLAGS` replaces the default `-g -O2` of the
+                # configure script
+                if base is None:
+                    base = '' if key == 'LDFLAGS' else _PGO_DEFAULT_FLAGS
+
+                env[key] = '{} {}'.format(base, flags).strip()
+
+            return env
+
+        prefix_flag = '-fprofile-prefix-path={}'.format(_sq(src_path))
+
+        hit = os.path.isdir(profile_dir)
+        self._events.cache_lookup('pgo', name, hit)
+
+        if hit:
+            _pinfo('Use the cached PGO profile data of {}'.format(name))
+        else:
+            os.makedirs(os.path.dirname(profile_dir), exist_ok=True)
+            tmp_profile_dir = tempfile.mkdtemp(dir=os.path.dirname(profile_dir))
+            train_env = dict(build_env)
+            train_env.update(flags_env('-fprofile-generate={} {} -fprofile-update=atomic'.format(_sq(tmp_profile_dir),
+                                                                                                 prefix_flag)))
+            self._runner.set_env(train_env)
+            self._runner.cd(src_path)
+
+            for phase, lines in (('pgo-conf', instructions.conf_lines),
+                                 ('pgo-build', instructions.build_lines),
+                                 ('pgo-install', instructions.install_lines)):
+                if lines is not None:
+                    _pinfo('Build {} for PGO training ({})'.format(name, phase))
+
+                    with self._step(name, phase):
+                        self._runner.run(lines)
+
+            _pinfo('Train {}'.format(name))
+
+            try:
+                with self._step(name, 'pgo-train'):
+                    self._pgo_run_training(name, tmp_profile_dir)
+
+                    # the final build must recompile everything
+                    self._runner.run('make clean')
+
+                os.replace(tmp_profile_dir, profile_dir)
+            finally:
+                # only keep complete profile data
+                if os.path.isdir(tmp_profile_dir):
+                    import shutil
+
+                    shutil.rmtree(tmp_profile_dir, ignore_errors=True)
+
+        use_flags = '-fprofile-use={} {} -fprofile-partial-training -Wno-missing-profile -Wno-coverage-mismatch'.format(_sq(profile_dir),
+                                                                                                                          prefix_flag)
+
+        if instructions.add_env is None:
+            instructions.add_env = {}
+
+        instructions.add_env.update(flags_env(use_flags))
+
+    def _pgo_run_training(self, name, work_dir):
+        import vlttng.selftrace
+
+        # trace to decode (the profile directory only gets `.gcda` files
+        # in subdirectories)
+        trace_path = os.path.join(work_dir, 'training-trace')
+        vlttng.selftrace.write_training_trace(trace_path,
+                                              _PGO_TRAINING_EVENT_COUNT)
+        sq_trace_path = _sq(trace_path)
+
+        if name == 'babeltrace2':
+            self._runner.run(['babeltrace2 {} > /dev/null'.format(sq_trace_path),
+                              'babeltrace2 --output-format=dummy {}'.format(sq_trace_path)])
+        else:
+            self._runner.run(['babeltrace {} > /dev/null'.format(sq_trace_path),
+                              'babeltrace -o dummy {}'.format(sq_trace_path)])
+
+        self._runner.rm_rf(trace_path)
+
+    def _record_abi(self, name, install_begin_ns):
+        import vlttng.abi
+
+        # margin for coarse file system timestamps: only this project's
+        # build runs just before its installation
+        libs, headers = vlttng.abi.installed_files(self._paths.usr,
+                                                   install_begin_ns - 2 * 10**9)
+        vlttng.abi.save(self._paths.venv, name,
+                        vlttng.abi.compute(self._paths.usr, libs, headers))
+
     def _create_executable_script(self, script_name, content):
         script_path = os.path.join(self._paths.venv,
                                    '{}.bash'.format(script_name))
@@ -840,14 +1733,29 @@ class VEnvCreator:
     def _create_update_script(self, instructions, name, exports, src_path):
         from vlttng.update_template import update_template as tmpl
 
+        import vlttng.update
+
         gitref = instructions.project.source.checkout
         uninstall_lines = ''
 
         if instructions.uninstall_lines is not None:
-            uninstall_lines = '\n'.join(instructions.uninstall_lines)
+            uninstall_lines = '\n    '.join(instructions.uninstall_lines)
+
+        rev_path = vlttng.update.rev_path(self._paths.venv, name)
+        # file which the configuration step creates, if any
+        configured_file = ''
+
+        if instructions.conf_lines:
+            if _is_meson_project(src_path):
+                configured_file = os.path.join(_MESON_BUILD_DIR, 'build.ninja')
+            else:
+                configured_file = 'Makefile'
 
         update = tmpl.format(name=name, src_path=_sq(src_path),
                              uninstall_lines=uninstall_lines, gitref=gitref,
+                             rev_path=_sq(rev_path),
+                             configured_file=_sq(configured_file),
+                             build_inputs_re=_BUILD_INPUTS_RE,
                              exports=exports)
         self._create_executable_script('update-{}'.format(name), update)
 
@@ -0,0 +1,135 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2016-2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# The activation environment of a virtual environment, as a list of
+# operations, each one being one of:
+#
+# `['set', NAME, VALUE]`:
+#     Set the environment variable `NAME` to `VALUE`.
+#
+# `['prepend', NAME, VALUE, SEP]`:
+#     Prepend `VALUE` to the environment variable `NAME`, separating
+#     it from the current value, if any, with `SEP`.
+#
+# `['prepend-default', NAME, VALUE, SEP]`:
+#     Like `prepend`, but always add `SEP`, even when `NAME` is unset
+#     or empty: an empty entry means the default search path (for
+#     example, `MANPATH` with `man`).
+#
+# `VEnvCreator` writes those operations to the state directory of the
+# virtual environment when it creates the `activate` script so that
+# `vlttng exec` doesn't need to compute them again. It also writes the
+# activation settings (profile environment, Java class path, and
+# whether or not there are LTTng kernel modules and LTTng Scope) so
+# that `vlttng update` can create the activation files again.
+#
+# Keep this module light: `vlttng exec` imports it.
+
+import os.path
+import json
+import os
+
+
+ENV_FILENAME = 'env.json'
+ACTIVATION_FILENAME = 'activation.json'
+
+
+def state_dir(venv_path):
+    return os.path.join(venv_path, '.vlttng')
+
+
+def env_path(venv_path):
+    return os.path.join(state_dir(venv_path), ENV_FILENAME)
+
+
+def activation_path(venv_path):
+    return os.path.join(state_dir(venv_path), ACTIVATION_FILENAME)
+
+
+def _write_json(path, node):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, 'w') as f:
+        json.dump(node, f, indent=2)
+
+    os.replace(tmp_path, path)
+
+
+def write(venv_path, ops):
+    _write_json(env_path(venv_path), ops)
+
+
+def load(venv_path):
+    with open(env_path(venv_path)) as f:
+        return json.load(f)
+
+
+def write_activation(venv_path, activation):
+    _write_json(activation_path(venv_path), activation)
+
+
+def load_activation(venv_path):
+    with open(activation_path(venv_path)) as f:
+        return json.load(f)
+
+
+def apply(ops, environ):
+    env = dict(environ)
+
+    for op in ops:
+        if op[0] == 'set':
+            env[op[1]] = op[2]
+        elif op[0] == 'prepend':
+            cur = env.get(op[1])
+
+            if cur:
+                env[op[1]] = op[2] + op[3] + cur
+            else:
+                env[op[1]] = op[2]
+        elif op[0] == 'prepend-default':
+            env[op[1]] = op[2] + op[3] + env.get(op[1], '')
+
+    return env
+
+
+def sh_lines(ops):
+    import shlex
+
+    lines = []
+
+    for op in ops:
+        name = op[1]
+        value = shlex.quote(op[2])
+
+        if op[0] == 'set':
+            lines.append('{}={}'.format(name, value))
+        elif op[0] == 'prepend':
+            # the separator is either `:` or a space: no quoting needed
+            # within the double quotes
+            lines.append('{n}={v}"${{{n}:+{s}${n}}}"'.format(n=name, v=value, s=op[3]))
+        elif op[0] == 'prepend-default':
+            lines.append('{n}={v}"{s}${n}"'.format(n=name, v=value, s=op[3]))
+
+        lines.append('export {}'.format(name))
+
+    return lines
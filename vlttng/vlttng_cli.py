@@ -20,25 +20,33 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+# Only import what's needed by all the modes here: the other modules
+# (YAML parsing, building) are imported when used so that
+# `vlttng --version` and `vlttng --list-default-profiles` start fast.
 from vlttng.utils import perror
-import importlib.resources
-import vlttng.profile
-import vlttng.venv
 import argparse
-import platform
 import os.path
 import vlttng
+import sys
 import re
 import os
 
 
-def _parse_args():
+def _default_jobs():
     try:
-        default_jobs = len(os.sched_getaffinity(0))
+        return len(os.sched_getaffinity(0))
     except:
-        default_jobs = 1
+        return 1
+
 
-    ap = argparse.ArgumentParser()
+def _parse_args():
+    default_jobs = _default_jobs()
+    epilog = 'Other commands: vlttng {} ... (see vlttng COMMAND --help). A first argument which is a command name selects this command: use ./NAME for a virtual environment path named like a command.'.format('|'.join(_COMMANDS))
+    ap = argparse.ArgumentParser(epilog=epilog)
+    ap.add_argument('--compiler', choices=('gcc', 'clang'),
+                    help='build the C/C++ projects with COMPILER')
+    ap.add_argument('--compress-logs', action='store_true',
+                    help='compress the log files with gzip')
     ap.add_argument('-f', '--force', action='store_true',
                     help='force the virtual environment creation')
     ap.add_argument('--hide-export', action='store_true',
@@ -51,11 +59,25 @@ def _parse_args():
                     help='number of make jobs to run simultaneously instead of {}'.format(default_jobs))
     ap.add_argument('-l', '--list-default-profiles', action='store_true',
                     help='list default profile names and exit')
+    ap.add_argument('--linker', choices=('auto', 'mold', 'lld', 'gold', 'bfd'),
+                    help='link the C/C++ projects with LINKER (auto: fastest working one)')
+    ap.add_argument('--maven-offline', action='store_true',
+                    help='only use the cached Maven artifacts to build Trace Compass and LTTng Scope')
+    ap.add_argument('--metrics-file', metavar='FILE',
+                    help='write build metrics to the OpenMetrics text file FILE during the run')
+    ap.add_argument('--no-history', action='store_true',
+                    help="don't read or record step durations in the build history")
     ap.add_argument('-o', '--override', metavar='PROP',
                     action='append',
                     help='override property in the effective profile (may be repeated)')
+    ap.add_argument('--pgo', action='store_true',
+                    help='build Babeltrace with profile-guided optimization (GCC 11 or later)')
+    ap.add_argument('-P', '--progress', action='store_true',
+                    help='show the progress of each step instead of the commands')
     ap.add_argument('-p', '--profile', metavar='PROFILE', action='append',
-                    help='profile name or path (may be repeated to patch)')
+                    help='profile name, SERIES@SPEC (for example lttng-tools@~2.13), or path (may be repeated to patch)')
+    ap.add_argument('--self-trace', action='store_true',
+                    help='record the build events of vlttng as a CTF trace in the virtual environment')
     ap.add_argument('-v', '--verbose', action='store_true',
                     help='verbose output')
     ap.add_argument('-V', '--version', action='version',
@@ -84,11 +106,30 @@ def _parse_args():
     return args
 
 
-def _find_profile(profile_name):
-    trav_res = importlib.resources.files() / vlttng._PROFILES_DIRNAME / '{}.yml'.format(profile_name)
+def _resolve_profile_spec(spec, verbose):
+    import vlttng.profile_index
+
+    try:
+        profile_name = vlttng.profile_index.load().resolve(spec)
+    except vlttng.profile_index.InvalidSpecifier as e:
+        perror(str(e))
+
+    if verbose:
+        print('Profile "{}" resolves to "{}"'.format(spec, profile_name))
+
+    return profile_name
+
 
-    if trav_res.is_file():
-        return trav_res.read_text()
+def _find_profile(profile_name, verbose=False):
+    import vlttng.profile_index
+
+    index = vlttng.profile_index.load()
+
+    if '@' in profile_name and profile_name not in index and not os.path.isfile(profile_name):
+        profile_name = _resolve_profile_spec(profile_name, verbose)
+
+    if profile_name in index:
+        return vlttng.profile_index.read_profile(profile_name)
     else:
         if not os.path.isfile(profile_name):
             perror('Cannot find profile "{}"'.format(profile_name))
@@ -98,6 +139,8 @@ def _find_profile(profile_name):
 
 
 def _create_overrides(override_args):
+    import vlttng.profile
+
     overrides = []
 
     try:
@@ -141,6 +184,8 @@ def _create_overrides(override_args):
 
 
 def _create_profile(profile_names, ignored_projects, override_args, verbose):
+    import vlttng.profile
+
     yaml_profiles = []
 
     try:
@@ -149,7 +194,7 @@ def _create_profile(profile_names, ignored_projects, override_args, verbose):
         perror('Cannot parse overrides: {}'.format(e))
 
     for profile_name in profile_names:
-        yaml_profiles.append(_find_profile(profile_name))
+        yaml_profiles.append(_find_profile(profile_name, verbose))
 
     try:
         profile = vlttng.profile.from_yaml_profiles(yaml_profiles, ignored_projects,
@@ -167,7 +212,7 @@ def _create_profile(profile_names, ignored_projects, override_args, verbose):
 
 
 def _register_sigint():
-    if platform.system() == 'Linux':
+    if sys.platform.startswith('linux'):
         def handler(signal, frame):
             perror('Cancelled by user: virtual environment is incomplete')
 
@@ -176,17 +221,136 @@ def _register_sigint():
 
 
 def _list_default_profiles():
-    filenames = []
+    import vlttng.profile_index
+
+    for name in sorted(vlttng.profile_index.load().names):
+        print(name)
+
+
+def _exec(argv):
+    ap = argparse.ArgumentParser(prog='vlttng exec',
+                                 description='Execute a command within an existing virtual environment.')
+    ap.add_argument('path', metavar='PATH', action='store',
+                    help='virtual environment path')
+    ap.add_argument('cmd', metavar='CMD', nargs=argparse.REMAINDER,
+                    help='command and its arguments (after `--`)')
+    args = ap.parse_args(argv)
+    cmd = args.cmd
+
+    if cmd and cmd[0] == '--':
+        cmd = cmd[1:]
+
+    if not cmd:
+        perror('Missing command to execute')
+
+    import vlttng.venv_env
+
+    path = os.path.abspath(args.path)
+
+    try:
+        ops = vlttng.venv_env.load(path)
+    except FileNotFoundError:
+        perror('"{}" is not a vlttng virtual environment (missing "{}")'.format(path,
+                                                                                vlttng.venv_env.env_path(path)))
+    except Exception as e:
+        perror('Cannot read the environment of "{}": {}'.format(path, e))
+
+    env = vlttng.venv_env.apply(ops, os.environ)
+
+    # replaces this process: `PATH` is the virtual environment's one to
+    # find `cmd[0]`
+    try:
+        os.execvpe(cmd[0], cmd, env)
+    except OSError as e:
+        perror('Cannot execute "{}": {}'.format(cmd[0], e.strerror))
+
+
+def _update(argv):
+    default_jobs = _default_jobs()
+    ap = argparse.ArgumentParser(prog='vlttng update',
+                                 description='Update the Git projects of an existing virtual environment.')
+    ap.add_argument('--compress-logs', action='store_true',
+                    help='compress the log files with gzip')
+    ap.add_argument('-j', '--jobs', nargs='?', const=None, metavar='JOBS',
+                    action='store', type=int, default=default_jobs,
+                    help='total number of make jobs to run simultaneously instead of {}'.format(default_jobs))
+    ap.add_argument('--metrics-file', metavar='FILE',
+                    help='write build metrics to the OpenMetrics text file FILE during the run')
+    ap.add_argument('--no-history', action='store_true',
+                    help="don't read or record step durations in the build history")
+    ap.add_argument('--self-trace', action='store_true',
+                    help='record the build events of vlttng as a CTF trace in the virtual environment')
+    ap.add_argument('-v', '--verbose', action='store_true',
+                    help='verbose output')
+    ap.add_argument('path', metavar='PATH', action='store',
+                    help='virtual environment path')
+    args = ap.parse_args(argv)
+    _register_sigint()
 
-    for res in (importlib.resources.files() / vlttng._PROFILES_DIRNAME).iterdir():
-        if res.is_file() and res.name.endswith('.yml'):
-            filenames.append(res.name)
+    import vlttng.update
 
-    for filename in sorted(filenames):
-        print(filename[:-4])
+    if not vlttng.update.update(os.path.abspath(args.path), args.jobs,
+                                args.verbose, args.compress_logs,
+                                args.metrics_file, args.self_trace,
+                                not args.no_history):
+        return 1
+
+    return 0
+
+
+def _report(argv):
+    ap = argparse.ArgumentParser(prog='vlttng report',
+                                 description='Analyze the recorded build of an existing virtual environment.')
+    ap.add_argument('path', metavar='PATH', action='store',
+                    help='virtual environment path')
+    args = ap.parse_args(argv)
+
+    import vlttng.report
+
+    vlttng.report.report(os.path.abspath(args.path))
+    return 0
+
+
+def _bench(argv):
+    ap = argparse.ArgumentParser(prog='vlttng bench',
+                                 description='Benchmark existing virtual environments and compare them.')
+    ap.add_argument('--compare', action='store_true',
+                    help='only compare the saved results of the virtual environments')
+    ap.add_argument('--events', type=int, default=1000000, metavar='COUNT',
+                    help='number of tracepoint hits (default: %(default)s)')
+    ap.add_argument('--iterations', type=int, default=5, metavar='COUNT',
+                    help='number of iterations of the decoding and session workloads (default: %(default)s)')
+    ap.add_argument('paths', metavar='PATH', action='store', nargs='+',
+                    help='virtual environment path')
+    args = ap.parse_args(argv)
+    _register_sigint()
+
+    import vlttng.bench
+
+    paths = [os.path.abspath(path) for path in args.paths]
+
+    if args.compare:
+        vlttng.bench.compare(paths)
+    else:
+        vlttng.bench.bench(paths, args.events, args.iterations)
+
+    return 0
+
+
+# `vlttng COMMAND ...` instead of `vlttng [OPTIONS] PATH` when the first
+# argument is a command name (use `./NAME` for such a path)
+_COMMANDS = {
+    'bench': _bench,
+    'exec': _exec,
+    'report': _report,
+    'update': _update,
+}
 
 
 def run():
+    if len(sys.argv) > 1 and sys.argv[1] in _COMMANDS:
+        return _COMMANDS[sys.argv[1]](sys.argv[2:])
+
     _register_sigint()
     args = _parse_args()
 
@@ -197,9 +361,20 @@ def run():
     profile = _create_profile(args.profile, args.ignore_project, args.override,
                               args.verbose)
 
+    import vlttng.venv
+
+    options = vlttng.venv.Options(compress_logs=args.compress_logs,
+                                  progress=args.progress,
+                                  metrics_file=args.metrics_file,
+                                  self_trace=args.self_trace,
+                                  history=not args.no_history,
+                                  pgo=args.pgo, compiler=args.compiler,
+                                  linker=args.linker,
+                                  maven_offline=args.maven_offline)
+
     try:
         vlttng.venv.VEnvCreator(args.path, profile, args.force, args.verbose,
-                                args.jobs, args.hide_export)
+                                args.jobs, args.hide_export, options)
     except Exception as e:
         perror('Unexpected error: {}'.format(e))
 
@@ -20,13 +20,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-from collections import namedtuple
 from vlttng.utils import perror
 from termcolor import colored
-import importlib.resources
 import argparse
-import platform
 import vlttng
+import sys
 import shlex
 import enum
 import os
@@ -45,7 +43,7 @@ def _parse_args():
 
 
 def _register_sigint():
-    if platform.system() == 'Linux':
+    if sys.platform.startswith('linux'):
         def handler(signal, frame):
             perror('Cancelled by user')
 
@@ -96,6 +94,7 @@ class _Wizard:
         self._profiles = []
         self._projects = []
         self._projects_versions = {}
+        self._latest_series_of = {}
         self._python_interpreter = None
         self._path = None
         self._state_handlers = {
@@ -144,22 +143,64 @@ class _Wizard:
             'urcu': [],
         }
 
-        filenames = []
+        import vlttng.profile_index
 
-        for res in (importlib.resources.files() / vlttng._PROFILES_DIRNAME).iterdir():
-            if res.is_file() and res.name.endswith('.yml'):
-                filenames.append(res.name)
+        self._index = vlttng.profile_index.load()
+        index = self._index
 
-        for filename in sorted(filenames):
-            profile = filename[:-4]
+        for project_name, versions in self._project_name_to_versions.items():
+            # releases, including platform-specific ones (for example,
+            # `tracecompass-linux-x86-64-4.0.0`), without prereleases
+            for series, series_versions in sorted(index.releases.items()):
+                if series == project_name:
+                    prefix = ''
+                elif series.startswith(project_name + '-'):
+                    prefix = series[len(project_name) + 1:] + '-'
+                else:
+                    continue
+
+                for version in series_versions:
+                    if not vlttng.profile_index.is_prerelease(version):
+                        versions.append(prefix + version)
+
+            # stable branches
+            for branch in index.branches.get(project_name, []):
+                if branch.startswith('stable-'):
+                    versions.append(branch)
+
+    # Profile series (for example, `tracecompass-linux-x86-64`) which
+    # contains the newest release of `project` among the series of which
+    # the wizard shows the versions, or `None` if there's no release.
+    #
+    # On equal versions, prefers the series of the host platform, then
+    # the series named `project`.
+    def _latest_series(self, project):
+        import vlttng.profile_index
+        import platform
+
+        system = platform.system().lower().replace('darwin', 'macos')
+        host = '{}-{}-{}'.format(project, system,
+                                 platform.machine().replace('_', '-'))
+        best_key = None
+        best_series = None
+
+        for series in self._index.releases:
+            if series != project and not series.startswith(project + '-'):
+                continue
 
-            if not re.match(r'^.+-\d+(\.\d+)*$', profile):
+            try:
+                name = self._index.resolve('{}@latest'.format(series))
+            except vlttng.profile_index.InvalidSpecifier:
                 continue
 
-            for project_name in self._project_name_to_versions:
-                if profile.startswith(project_name + '-'):
-                    profile_suffix = profile[len(project_name) + 1:]
-                    self._project_name_to_versions[project_name].append(profile_suffix)
+            key = (vlttng.profile_index.version_key(name[len(series) + 1:]),
+                   series == host, series == project)
+
+            if best_key is None or key > best_key:
+                best_key = key
+                best_series = series
+
+        return best_series
 
     def _handle_state(self):
         self._state_handlers[self._state]()
@@ -326,9 +367,16 @@ the projects and features you need.
             print(_cquestion(question))
             print()
             choices = []
-            versions = self._project_name_to_versions[project]
+            versions = list(self._project_name_to_versions[project])
+            latest_series = self._latest_series(project)
+
+            if latest_series is not None:
+                latest = self._index.resolve('{}@latest'.format(latest_series))
+                versions.insert(0, 'latest')
+                choices.append(('latest', 'currently {}'.format(latest[len(project) + 1:])))
+                self._latest_series_of[project] = latest_series
 
-            for version in versions:
+            for version in versions[len(choices):]:
                 choices.append((version,))
 
             self._pchoices(choices)
@@ -340,7 +388,11 @@ the projects and features you need.
             self._projects_versions[project] = version
 
         for project, version in self._projects_versions.items():
-            self._profiles.append('{}-{}'.format(project, version))
+            if version == 'latest':
+                # resolved by `vlttng` itself
+                self._profiles.append('{}@latest'.format(self._latest_series_of[project]))
+            else:
+                self._profiles.append('{}-{}'.format(project, version))
 
         self._state = _WizardState.ASK_FEATURE
 